@@ -0,0 +1,332 @@
+"""
+Local servers for the benchmark suite: a fixture website and an OpenAI API stub.
+
+FixtureSite serves robots.txt, a sitemap, paginated list pages and blog posts
+rendered from the templates in fixtures/ (or the pages of a PageArchive, i.e.
+HTML recorded by `crawl_site --archive`). Post text is generated from a seed per
+page, so every run serves the same site and no two posts are near-duplicates.
+Some posts are well-structured articles the local extractor handles; the rest
+are markup soup that needs the LLM.
+
+OpenAIStub answers chat completions (strategy, page and PDF chunk extraction)
+after a configurable latency, and fails a configurable share of them with 500s,
+429s or invalid JSON. It also implements the files/batches endpoints used by
+Batch API mode.
+"""
+
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+POSTS_PER_LIST_PAGE = 20
+
+WORDS = (
+    "array graph tree heap queue stack hash table pointer recursion memo dynamic programming greedy interval "
+    "binary search sort merge partition pivot window prefix suffix trie segment union find cycle path shortest "
+    "breadth depth traversal node edge weight cost latency cache eviction shard replica leader quorum consensus "
+    "interview candidate offer recruiter onsite phone screen behavioral system design scale throughput bottleneck "
+    "database index query join transaction lock deadlock isolation snapshot stream batch pipeline worker thread "
+    "process memory allocation garbage collector compile runtime profile benchmark regression complexity bound "
+    "amortized constant linear logarithmic quadratic exponential tradeoff whiteboard mock feedback practice "
+    "company startup engineer senior staff manager promotion salary negotiation resume portfolio project"
+).split()
+AUTHORS = ["Aline Lerner", "Nil Mamano", "Kevin Landucci", "Mike Mroczka", "Unknown"]
+
+def _template(name: str) -> string.Template:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return string.Template(f.read())
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+class FixtureSite:
+    """
+    The fixture website. `pages` posts are listed in /sitemap.xml (unless
+    `sitemap` is False, for link-following crawls) and on the /blog/ list pages.
+    A `local_share` of posts use the structured article template.
+    """
+    def __init__(self, pages: int = 200, latency: float = 0.05, sitemap: bool = True, local_share: float = 0.3,
+                 archive_path: str | None = None):
+        self.pages = pages
+        self.latency = latency
+        self.sitemap = sitemap
+        self.local_share = local_share
+        self.requests = 0
+        self.recorded = {}  # path -> HTML of a recorded page
+        if archive_path:
+            from page_archive import iter_archive
+            for record in iter_archive(archive_path):
+                path = urlparse(record["url"]).path or "/"
+                self.recorded[path] = record["body"]
+        self._templates = {name: _template(name) for name in ("robots.txt", "article.html", "post.html", "list.html")}
+        self._lock = threading.Lock()
+
+    def post_paths(self) -> list:
+        if self.recorded:
+            return sorted(self.recorded)
+        return [f"/blog/post-{i}" for i in range(self.pages)]
+
+    def list_pages(self) -> int:
+        return max(1, -(-len(self.post_paths()) // POSTS_PER_LIST_PAGE))
+
+    def render(self, path: str, host: str) -> tuple[int, str, str]:
+        """(status, content type, body) for a request path"""
+        if path == "/robots.txt":
+            line = f"Sitemap: http://{host}/sitemap.xml" if self.sitemap else ""
+            return 200, "text/plain", self._templates["robots.txt"].substitute(sitemap_line=line)
+        if path == "/sitemap.xml":
+            if not self.sitemap:
+                return 404, "text/plain", "not found"
+            urls = ["/blog/"] + [f"/blog/page/{n}" for n in range(2, self.list_pages() + 1)] + self.post_paths()
+            entries = "".join(f"<url><loc>http://{host}{url}</loc><lastmod>2024-05-01</lastmod></url>" for url in urls)
+            return 200, "application/xml", f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+        if path in self.recorded:
+            return 200, "text/html", self.recorded[path]
+        if path in ("/blog", "/blog/"):
+            return 200, "text/html", self._list_page(1)
+        match = re.fullmatch(r"/blog/page/(\d+)", path)
+        if match and 1 <= int(match.group(1)) <= self.list_pages():
+            return 200, "text/html", self._list_page(int(match.group(1)))
+        match = re.fullmatch(r"/blog/post-(\d+)", path)
+        if match and not self.recorded and int(match.group(1)) < self.pages:
+            return 200, "text/html", self._post(int(match.group(1)))
+        return 404, "text/html", "<html><body>Not found</body></html>"
+
+    def _list_page(self, page: int) -> str:
+        paths = self.post_paths()[(page - 1) * POSTS_PER_LIST_PAGE:page * POSTS_PER_LIST_PAGE]
+        cards = "\n".join(
+            f'      <div class="card"><h2><a href="{path}">{self._title(path)}</a></h2>'
+            f'<p>{_sentence(random.Random(path))}</p></div>' for path in paths
+        )
+        pagination = " ".join(f'<a href="/blog/page/{n}">{n}</a>' for n in range(2, self.list_pages() + 1))
+        return self._templates["list.html"].substitute(page=page, cards=cards, pagination=pagination)
+
+    def _title(self, path: str) -> str:
+        rng = random.Random(f"title:{path}")
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7))).title()
+
+    def _post(self, i: int) -> str:
+        path = f"/blog/post-{i}"
+        rng = random.Random(i)
+        paragraphs = "\n".join(
+            "        <p>" + " ".join(_sentence(rng) for _ in range(rng.randint(3, 8))) + "</p>"
+            for _ in range(rng.randint(4, 14))
+        )
+        related = "\n".join(
+            f'        <li><a href="/blog/post-{j}">{self._title(f"/blog/post-{j}")}</a></li>'
+            for j in rng.sample(range(self.pages), min(5, self.pages))
+        )
+        template = "article.html" if rng.random() < self.local_share else "post.html"
+        return self._templates[template].substitute(
+            title=self._title(path), author=rng.choice(AUTHORS), date=f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            path=path, body=paragraphs, related=related,
+        )
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                time.sleep(site.latency)
+                status, content_type, body = site.render(urlparse(self.path).path, self.headers.get("Host", ""))
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+class OpenAIStub:
+    """
+    Chat completions answered after `latency` seconds (plus up to `jitter`).
+    `failure_rate`, `rate_limit_rate` and `invalid_json_rate` are the shares of
+    calls answered with a 500, a 429 and unparseable content.
+    """
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, failure_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, invalid_json_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.invalid_json_rate = invalid_json_rate
+        self.stats = {"chat": 0, "errors": 0, "rate_limited": 0, "invalid_json": 0, "batch_requests": 0}
+        self._rng = random.Random(seed)
+        self._files = {}
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def answer(self, body: dict) -> dict:
+        """A chat.completion object for a request body, shaped after what the scraper asks for"""
+        messages = body["messages"]
+        system, user = messages[0]["content"], messages[-1]["content"]
+        if "strategist" in system:
+            content = {"method": "simple_requests", "reasoning": "benchmark stub"}
+        elif "<BOOK_TITLE>" in user:
+            section = re.search(r"Section (\d+)", user)
+            content = {"title": f"Section {section.group(1) if section else '?'}", "content": user[-400:],
+                       "content_type": "book", "author": "Unknown", "key_concepts": [], "code_snippets": []}
+        else:
+            url = re.search(r"Source URL: (\S+)", user)
+            url = url.group(1) if url else ""
+            text = user.split("<HTML_CONTENT>")[-1].split("</HTML_CONTENT>")[0].strip()
+            content = {"items": [{"title": text[:60] or url, "content": text[:800], "content_type": "blog",
+                                  "source_url": url, "author": "Unknown", "user_id": ""}]}
+        content = json.dumps(content)
+        if self.invalid_json_rate and self._draw() < self.invalid_json_rate:
+            self._count("invalid_json")
+            content = content[:len(content) // 2]  # A truncated answer
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        return {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4},
+        }
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, obj, status: int = 200, headers: dict | None = None):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path.startswith("/v1/batches/"):
+                    batch = stub._batches[path.rsplit("/", 1)[-1]]
+                    batch["status"] = "completed"  # Done by the first poll
+                    return self.send_json(batch)
+                if path.startswith("/v1/files/") and path.endswith("/content"):
+                    data = stub._files[path.split("/")[-2]].encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    return self.wfile.write(data)
+                self.send_json({"error": {"message": "not found"}}, 404)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = urlparse(self.path).path
+                if path == "/v1/files":
+                    # Multipart upload: keep the JSONL request lines
+                    lines = [line for line in raw.decode("utf-8", "ignore").splitlines() if line.startswith('{"custom_id"')]
+                    with stub._lock:
+                        file_id = f"file-{len(stub._files)}"
+                        stub._files[file_id] = "\n".join(lines)
+                    return self.send_json({"id": file_id, "object": "file", "bytes": len(raw), "created_at": 0,
+                                           "filename": "requests.jsonl", "purpose": "batch", "status": "processed"})
+                if path == "/v1/batches":
+                    return self.create_batch(json.loads(raw))
+                if path == "/v1/chat/completions":
+                    return self.chat(json.loads(raw))
+                self.send_json({"error": {"message": "not found"}}, 404)
+
+            def chat(self, body: dict):
+                stub._count("chat")
+                time.sleep(max(0.0, stub.latency + stub._draw() * stub.jitter))
+                draw = stub._draw()
+                if draw < stub.rate_limit_rate:
+                    stub._count("rate_limited")
+                    return self.send_json({"error": {"message": "Rate limit reached", "type": "requests",
+                                                     "code": "rate_limit_exceeded"}}, 429, {"retry-after-ms": "200"})
+                if draw < stub.rate_limit_rate + stub.failure_rate:
+                    stub._count("errors")
+                    return self.send_json({"error": {"message": "The server had an error", "type": "server_error"}}, 500)
+                self.send_json(stub.answer(body), headers={"x-ratelimit-remaining-requests": "10000",
+                                                           "x-ratelimit-remaining-tokens": "10000000"})
+
+            def create_batch(self, request: dict):
+                answers = []
+                for line in stub._files[request["input_file_id"]].splitlines():
+                    item = json.loads(line)
+                    stub._count("batch_requests")
+                    answers.append(json.dumps({"id": "batch_req", "custom_id": item["custom_id"], "error": None,
+                                               "response": {"status_code": 200, "request_id": "req",
+                                                            "body": stub.answer(item["body"])}}))
+                with stub._lock:
+                    output_id = f"file-{len(stub._files)}"
+                    stub._files[output_id] = "\n".join(answers)
+                    batch_id = f"batch-{len(stub._batches)}"
+                    stub._batches[batch_id] = {
+                        "id": batch_id, "object": "batch", "endpoint": request["endpoint"],
+                        "input_file_id": request["input_file_id"], "completion_window": request["completion_window"],
+                        "created_at": 0, "status": "in_progress", "output_file_id": output_id,
+                        "request_counts": {"completed": len(answers), "failed": 0, "total": len(answers)},
+                    }
+                    batch = dict(stub._batches[batch_id])
+                self.send_json(batch)
+
+        return Handler
+
+def serve(app) -> ThreadingHTTPServer:
+    """Starts a FixtureSite or OpenAIStub on a free local port, in a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), app.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_fixture_pdf(path: str, pages: int = 200, seed: int = 0):
+    """
+    Writes a text-only PDF of `pages` pages with a chapter heading every ten pages,
+    so PDF benchmarks need no recorded book (or PDF library).
+    """
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(pages):
+        lines = []
+        if number % 10 == 0:
+            lines += [f"Chapter {number // 10 + 1}: {' '.join(rng.choice(WORDS) for _ in range(3)).title()}", ""]
+        while len(lines) < 55:
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+        text = "".join("(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 13 TL 50 760 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids))
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, obj in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the HTML parsing step.
+
+Compares the old per-page work (html.parser parse for the extraction text plus a
+second html.parser parse for links) with a single parse per page on each
+available backend. Pass saved HTML files to benchmark real pages; without
+arguments, synthetic blog and list pages of a few sizes are used.
+
+    python benchmarks/parse_benchmark.py [page.html ...] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scraper"))
+
+from bs4 import BeautifulSoup
+from html_parser import BACKENDS, parse_html
+
+def synthetic_article(paragraphs: int) -> str:
+    nav = "<nav>" + "".join(f'<a href="/section/{i}">Section {i}</a>' for i in range(40)) + "</nav>"
+    body = "".join(
+        f"<p>Paragraph {i} of the post, with <a href='/ref/{i}'>a link</a> and "
+        + "some ordinary prose about interviewing and algorithms " * 8 + "</p>"
+        for i in range(paragraphs)
+    )
+    footer = "<footer>" + "".join(f'<a href="/f/{i}">Footer {i}</a>' for i in range(60)) + "</footer>"
+    return (f"<html><head><title>Post</title><script>{'var x = 1;' * 500}</script></head><body>{nav}"
+            f"<main><article><h1>Post</h1>{body}</article></main><aside>Related posts</aside>{footer}</body></html>")
+
+def synthetic_list(cards: int) -> str:
+    items = "".join(
+        f"<div class='card'><h2><a href='/blog/post-{i}'>Post {i}</a></h2><p>{'A short teaser. ' * 10}</p></div>"
+        for i in range(cards)
+    )
+    return f"<html><body><header>Blog</header><div class='list'>{items}</div><footer>Footer</footer></body></html>"
+
+def old_path(html: str):
+    """What a page cost before: two html.parser parses"""
+    BeautifulSoup(html, "html.parser").get_text(separator=' ', strip=True)[:10000]
+    [a["href"] for a in BeautifulSoup(html, "html.parser").find_all("a", href=True)]
+
+def new_path(html: str, backend: str):
+    page = parse_html(html, backend)
+    page.links()
+    page.main_text()
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing backends")
+    parser.add_argument("files", nargs="*", help="Saved HTML pages to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page and backend")
+    args = parser.parse_args()
+
+    if args.files:
+        pages = [(os.path.basename(path), open(path, encoding="utf-8", errors="replace").read()) for path in args.files]
+    else:
+        pages = [
+            ("article-small", synthetic_article(20)),
+            ("article-large", synthetic_article(1500)),
+            ("list-page", synthetic_list(300)),
+        ]
+
+    backends = sorted(BACKENDS)
+    header = f"{'page':<20}{'size':>10}{'old (ms)':>12}" + "".join(f"{b + ' (ms)':>20}" for b in backends)
+    print(header)
+    print("-" * len(header))
+    for name, html in pages:
+        old = timed(lambda: old_path(html), args.repeat)
+        row = f"{name:<20}{len(html) // 1024:>8}KB{old:>12.1f}"
+        for backend in backends:
+            new = timed(lambda: new_path(html, backend), args.repeat)
+            row += f"{new:>12.1f} ({old / new:>4.1f}x)"
+        print(row)
+
+if __name__ == "__main__":
+    main()
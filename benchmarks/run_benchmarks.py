@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the scraper.
+
+Serves a fixture website and an OpenAI API stub locally (see bench_server.py),
+runs each crawl mode in a fresh process against them and reports pages/sec,
+p50/p99 per-page latency and peak RSS. Nothing touches the network or spends
+tokens, so runs are repeatable and can gate performance changes:
+
+    python benchmarks/run_benchmarks.py --save baseline.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json   # exits 1 on a regression
+
+Modes:
+    sitemap   crawl from the sitemap through the fetch/parse/extract pipeline
+    links     link-following crawl (the site has no sitemap)
+    ndjson    sitemap crawl streaming items to an NDJSON file
+    batch     sitemap crawl with OpenAI Batch API extraction
+    extract   _ai_extract_content alone, over pages fetched beforehand
+    pdf       PDFProcessor over a generated PDF
+
+Per-page latency is the time a page spent in the scraper's stages (strategy,
+fetch, parse, extraction), without time queued between them; for the pdf mode
+it is the extraction time of each chunk.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, os.path.join(ROOT, "scraper"))
+sys.path.insert(0, ROOT)
+
+MODES = ("sitemap", "links", "ndjson", "batch", "extract", "pdf")
+# Settings that change the workload; a baseline is only comparable when they match
+COMPARED_SETTINGS = ("pages", "pdf_pages", "workers", "archive", "local_share", "site_latency", "llm_latency",
+                     "llm_jitter", "failure_rate", "rate_limit_rate", "invalid_json_rate")
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # Bytes on macOS, KB on Linux
+
+def page_latencies(metrics) -> list:
+    return [sum(entry["seconds"].values()) for url, entry in metrics.urls.items() if "fetch" in entry["seconds"]]
+
+# Child process: runs one mode and writes its measurements to a JSON file
+
+def run_crawl(config: dict, mode: str, workdir: str) -> dict:
+    from scraper.crawler import Crawler
+    from ndjson_output import NDJSONItemWriter
+
+    base = config["nositemap_url"] if mode == "links" else config["site_url"]
+    crawler = Crawler(workers=config["workers"], per_host_limit=config["workers"], requests_per_second=1000,
+                      max_pages=config["pages"] + 100)
+    started = time.perf_counter()
+    if mode == "ndjson":
+        sink = NDJSONItemWriter(os.path.join(workdir, "items.ndjson"))
+        try:
+            result = crawler.crawl(base + "/blog/", sink=sink)
+        finally:
+            sink.close()
+        items = result.get("items_written", 0)
+    else:
+        result = crawler.crawl(base + "/blog/", batch=mode == "batch")
+        items = len(result.get("items", []))
+    seconds = time.perf_counter() - started
+    metrics = crawler.scraper.metrics
+    return {"units": metrics.counters["pages_fetched"], "seconds": seconds, "items": items,
+            "latencies": page_latencies(metrics), "metrics": metrics}
+
+def run_extract(config: dict, mode: str, workdir: str) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from agent_scraper import KadoaInspiredScraper
+
+    scraper = KadoaInspiredScraper(local_confidence=None, http_pool_size=config["workers"])
+    urls = [config["site_url"] + path for path in config["post_paths"]]
+    with ThreadPoolExecutor(max_workers=config["workers"]) as executor:
+        pages = list(executor.map(lambda url: scraper.http.get(url).text, urls))
+
+    def extract(url_html):
+        started = time.perf_counter()
+        result = scraper._ai_extract_content(url_html[1], url_html[0])
+        return time.perf_counter() - started, len(result.get("items", []))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config["workers"]) as executor:
+        timings = list(executor.map(extract, zip(urls, pages)))
+    seconds = time.perf_counter() - started
+    return {"units": len(urls), "seconds": seconds, "items": sum(items for _, items in timings),
+            "latencies": [latency for latency, _ in timings], "metrics": scraper.metrics}
+
+def run_pdf(config: dict, mode: str, workdir: str) -> dict:
+    from pdf_processor import PDFProcessor
+
+    processor = PDFProcessor(max_concurrency=config["workers"])
+    started = time.perf_counter()
+    items = processor.process_pdf(config["pdf_path"], "Benchmark Book")
+    seconds = time.perf_counter() - started
+    histogram = processor.metrics.stages["pdf_extract"]
+    return {"units": processor.metrics.counters["pdf_pages"], "seconds": seconds, "items": len(items),
+            "p50": histogram.quantile(0.5), "p99": histogram.quantile(0.99), "metrics": processor.metrics}
+
+RUNNERS = {"sitemap": run_crawl, "links": run_crawl, "ndjson": run_crawl, "batch": run_crawl,
+           "extract": run_extract, "pdf": run_pdf}
+
+def child(mode: str, config_path: str, result_path: str, verbose: bool):
+    import logging
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    import agent_scraper  # Configures logging on import; quiet it down afterwards
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    run = RUNNERS[mode](config, mode, os.path.dirname(result_path))
+    latencies = run.pop("latencies", None)
+    metrics = run.pop("metrics")
+    tokens = metrics.summary(per_url=False)["tokens"]
+    result = {
+        "mode": mode,
+        "units": run["units"],
+        "seconds": round(run["seconds"], 3),
+        "per_sec": round(run["units"] / run["seconds"], 2) if run["seconds"] else 0.0,
+        "p50": round(run["p50"] if latencies is None else percentile(latencies, 0.5), 4),
+        "p99": round(run["p99"] if latencies is None else percentile(latencies, 0.99), 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "items": run["items"],
+        "prompt_tokens": sum(usage["prompt_tokens"] for usage in tokens.values()),
+        "completion_tokens": sum(usage["completion_tokens"] for usage in tokens.values()),
+    }
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+# Parent process: serves the fixtures, runs every mode and reports
+
+def run_mode(mode: str, config: dict, stub, args) -> dict:
+    """Runs one mode in a fresh process, with its own HOME so LLM cache and strategy memory start empty."""
+    workdir = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    try:
+        config_path = os.path.join(workdir, "config.json")
+        result_path = os.path.join(workdir, "result.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        env = {**os.environ, "HOME": workdir, "OPENAI_API_KEY": "sk-benchmark", "OPENAI_BASE_URL": config["stub_url"]}
+        before = dict(stub.stats)
+        command = [sys.executable, os.path.abspath(__file__), "--child", mode, config_path, result_path]
+        if args.verbose:
+            command.append("--verbose")
+        with open(os.path.join(workdir, "output.log"), "w", encoding="utf-8") as log:
+            process = subprocess.run(command, env=env, cwd=workdir, stdout=None if args.verbose else log,
+                                     stderr=subprocess.STDOUT if not args.verbose else None)
+        if process.returncode != 0 or not os.path.exists(result_path):
+            with open(os.path.join(workdir, "output.log"), "r", encoding="utf-8") as log:
+                tail = log.read()[-3000:]
+            raise RuntimeError(f"{mode} benchmark failed (exit code {process.returncode}):\n{tail}")
+        with open(result_path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        result["llm_calls"] = stub.stats["chat"] - before["chat"] + stub.stats["batch_requests"] - before["batch_requests"]
+        result["llm_failures"] = sum(stub.stats[key] - before[key] for key in ("errors", "rate_limited", "invalid_json"))
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(results: list):
+    header = f"{'mode':<9} {'units':>6} {'seconds':>8} {'per sec':>8} {'p50 s':>7} {'p99 s':>7} {'peak RSS':>9} {'items':>6} {'LLM calls':>9} {'failed':>6} {'tokens':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        unit = "pages" if r["mode"] == "pdf" else "urls"
+        print(f"{r['mode']:<9} {r['units']:>6} {r['seconds']:>8.2f} {r['per_sec']:>8.2f} {r['p50']:>7.3f} {r['p99']:>7.3f} "
+              f"{r['peak_rss_mb']:>7.1f}MB {r['items']:>6} {r['llm_calls']:>9} {r['llm_failures']:>6} "
+              f"{r['prompt_tokens'] + r['completion_tokens']:>9}  ({unit})")
+
+def compare(results: list, settings: dict, baseline_path: str, tolerance: float) -> list:
+    """Regressions against a saved run: throughput lower, or peak RSS higher, by more than `tolerance`"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    baseline = {r["mode"]: r for r in saved["results"]}
+    differing = [key for key, value in settings.items() if key in COMPARED_SETTINGS and saved["settings"].get(key) != value]
+    if differing:
+        print(f"⚠️ The baseline was run with different settings ({', '.join(differing)}); results may not be comparable")
+    regressions = []
+    for r in results:
+        base = baseline.get(r["mode"])
+        if base is None:
+            continue
+        if r["per_sec"] < base["per_sec"] * (1 - tolerance):
+            regressions.append(f"{r['mode']}: {r['per_sec']:.2f}/s vs {base['per_sec']:.2f}/s in the baseline")
+        if r["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{r['mode']}: peak RSS {r['peak_rss_mb']:.1f}MB vs {base['peak_rss_mb']:.1f}MB in the baseline")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks against a fixture site and an OpenAI stub")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help=f"Comma-separated modes to run ({', '.join(MODES)})")
+    parser.add_argument("--pages", type=int, default=100, help="Blog posts on the fixture site")
+    parser.add_argument("--pdf-pages", type=int, default=200, dest="pdf_pages", help="Pages of the generated PDF")
+    parser.add_argument("--workers", type=int, default=8, help="Crawler workers / concurrent extractions")
+    parser.add_argument("--archive", type=str, default=None, help="Serve the pages of a crawl_site --archive file instead of generated posts")
+    parser.add_argument("--local-share", type=float, default=0.3, dest="local_share", help="Share of generated posts the local extractor can handle")
+    parser.add_argument("--site-latency", type=float, default=0.05, dest="site_latency", help="Seconds before the fixture site answers")
+    parser.add_argument("--llm-latency", type=float, default=0.3, dest="llm_latency", help="Seconds before the OpenAI stub answers")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, dest="llm_jitter", help="Extra random stub latency, up to this many seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, dest="failure_rate", help="Share of LLM calls failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, dest="rate_limit_rate", help="Share of LLM calls rejected with a 429")
+    parser.add_argument("--invalid-json-rate", type=float, default=0.0, dest="invalid_json_rate", help="Share of LLM answers cut off mid-JSON")
+    parser.add_argument("--save", type=str, default=None, help="Save the results to this JSON file (e.g. as a baseline)")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against saved results; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown / memory growth against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the scraper's output")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CONFIG", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child, verbose=args.verbose)
+        return
+
+    from bench_server import FixtureSite, OpenAIStub, serve, write_fixture_pdf
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    site_options = {"pages": args.pages, "latency": args.site_latency, "local_share": args.local_share,
+                    "archive_path": args.archive}
+    fixture_site = FixtureSite(**site_options)
+    site = serve(fixture_site)
+    nositemap_site = serve(FixtureSite(sitemap=False, **site_options))
+    stub = OpenAIStub(latency=args.llm_latency, jitter=args.llm_jitter, failure_rate=args.failure_rate,
+                      rate_limit_rate=args.rate_limit_rate, invalid_json_rate=args.invalid_json_rate)
+    stub_server = serve(stub)
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    config = {
+        "site_url": f"http://127.0.0.1:{site.server_port}",
+        "nositemap_url": f"http://127.0.0.1:{nositemap_site.server_port}",
+        "stub_url": f"http://127.0.0.1:{stub_server.server_port}/v1",
+        "pages": len(fixture_site.post_paths()),
+        "post_paths": fixture_site.post_paths(),
+        "workers": args.workers,
+        "pdf_path": os.path.join(workdir, "benchmark.pdf"),
+    }
+    if "pdf" in modes:
+        write_fixture_pdf(config["pdf_path"], args.pdf_pages)
+
+    results = []
+    try:
+        for mode in modes:
+            print(f"⏱️ Running {mode} benchmark...", flush=True)
+            results.append({**run_mode(mode, config, stub, args), "workers": args.workers})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print_report(results)
+    saved_settings = {key: value for key, value in vars(args).items() if key in COMPARED_SETTINGS}
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": saved_settings, "results": results}, f, indent=4)
+        print(f"\n✅ Results saved to {args.save}")
+    if args.baseline:
+        regressions = compare(results, saved_settings, args.baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import argparse
+import glob
 import os
 import sys
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Add scraper directory to path to import modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
@@ -9,21 +12,45 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'scraper'))
 from agent_scraper import KadoaInspiredScraper
 from pdf_processor import PDFProcessor
 from api_key_manager import APIKeyManager
+from llm_cache import get_llm_cache
+from metrics import get_metrics
+from ndjson_output import NDJSONItemWriter, iter_ndjson_items, finalize_ndjson
+from near_dup import deduplicate_near
+from page_archive import iter_archive
 from scraper.crawler import Crawler
+from scraper.checkpoint import CrawlCheckpoint, remove_checkpoint
 
-def scrape_pdf(file_path: str, output_path: str):
-    """Scrapes a single PDF file and saves the result to a file."""
+def find_pdfs(path: str) -> list:
+    """PDF files named by a path: the file itself, every PDF in a directory, or a glob's matches."""
+    if os.path.isdir(path):
+        path = os.path.join(glob.escape(path), "**", "*")
+    if glob.has_magic(path):
+        # The suffix is matched case-insensitively: scans and exports are often named .PDF
+        return sorted(p for p in glob.glob(path, recursive=True) if p.lower().endswith(".pdf") and os.path.isfile(p))
+    return [path] if os.path.exists(path) else []
+
+def scrape_pdf(file_path: str, output_path: str, batch: bool = False, workers: int = None, concurrency: int = 4,
+               chunk_tokens: int = 2500, overlap_tokens: int = 150):
+    """Scrapes a PDF file, or every PDF in a directory or glob, and saves the result to a file."""
     print(f"📖 Scraping PDF: {file_path}")
     
-    if not os.path.exists(file_path):
-        print(f"❌ Error: File not found at {file_path}")
+    pdf_paths = find_pdfs(file_path)
+    if not pdf_paths:
+        print(f"❌ Error: No PDF found at {file_path}")
         return
+    if len(pdf_paths) > 1:
+        print(f"📚 Found {len(pdf_paths)} PDFs")
         
-    processor = PDFProcessor()
-    # Extract title from the filename
-    title = os.path.splitext(os.path.basename(file_path))[0].replace("_", " ").title()
-    
-    items = processor.process_pdf(pdf_path=file_path, title=title)
+    processor = PDFProcessor(workers=workers, max_concurrency=concurrency,
+                             chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    items = []
+    for pdf_path in pdf_paths:
+        # Extract title from the filename
+        title = os.path.splitext(os.path.basename(pdf_path))[0].replace("_", " ").title()
+        pdf_items = processor.process_pdf(pdf_path=pdf_path, title=title, batch=batch)
+        if not pdf_items:
+            print(f"⚠️ No data extracted from {pdf_path}")
+        items.extend(pdf_items)
     
     if items:
         # The output from PDF processor is a list of items, but the standard format is a dictionary
@@ -37,21 +64,149 @@ def scrape_pdf(file_path: str, output_path: str):
         print(f"✅ Results saved to {output_path}")
     else:
         print(f"❌ Scraping failed for {file_path}. No data was extracted.")
+    report_cache_stats()
 
-def crawl_site(url: str, output_path: str):
+def crawl_site(url: str, output_path: str, workers: int = 1, per_host_limit: int = 4, incremental: bool = False,
+               requests_per_second: float = 2.0, output_format: str = "json", resume: bool = False,
+               batch: bool = False, max_depth: int = 3, max_pages: int = 500, stage_workers: dict | None = None,
+               archive_path: str | None = None):
     """Crawls an entire website and saves all scraped data."""
     print(f"🚀 Starting full site crawl for: {url}")
     
-    crawler = Crawler()
-    data = crawler.crawl(url)
+    state_path = None
+    previous_items = None
+    if incremental:
+        # Validators live next to the output; the previous output is merged into the new one
+        state_path = f"{output_path}.state.json"
+        if os.path.exists(output_path):
+            if output_format == "ndjson":
+                previous_items = list(iter_ndjson_items(output_path))
+            else:
+                with open(output_path, "r", encoding="utf-8") as f:
+                    previous_items = json.load(f).get("items", [])
+            print(f"♻️ Incremental crawl: merging into {len(previous_items)} items from {output_path}")
+    
+    crawler = Crawler(workers=workers, per_host_limit=per_host_limit, state_path=state_path,
+                      requests_per_second=requests_per_second, max_depth=max_depth, max_pages=max_pages,
+                      archive_path=archive_path, **(stage_workers or {}))
+    # Progress is checkpointed next to the output so an interrupted crawl can be resumed;
+    # the checkpoint is removed once the crawl finishes
+    checkpoint_path = f"{output_path}.checkpoint.db"
+    if not resume:
+        remove_checkpoint(checkpoint_path)
+    checkpoint = CrawlCheckpoint(checkpoint_path)
+    if resume:
+        print(f"⏯️ Resuming from {checkpoint.path}")
+    
+    if output_format == "ndjson":
+        # Items are appended to the file as they are extracted. An incremental crawl streams into
+        # a side file instead, so an interrupted run leaves the previous output (and its items) intact
+        stream_path = f"{output_path}.partial" if previous_items is not None else output_path
+        sink = NDJSONItemWriter(stream_path, append=resume)
+        try:
+            data = crawler.crawl(url, previous_items=previous_items, sink=sink, checkpoint=checkpoint, resume=resume,
+                                 batch=batch)
+        finally:
+            sink.close()
+            checkpoint.close()
+        if stream_path != output_path:
+            if data.get("status") == "crawl_completed":
+                os.replace(stream_path, output_path)
+            else:
+                os.remove(stream_path)
+        if data.get("status") == "crawl_completed":
+            crawler.save_state()
+        remove_checkpoint(checkpoint_path)
+        if data.get("items_written"):
+            print(f"✅ Crawl finished. Streamed {data['items_written']} items to {output_path}")
+            print(f"Run 'python cli.py finalize {output_path}' to build the JSON document.")
+        else:
+            print(f"❌ Crawling failed for {url}. Reason: {data.get('status', 'Unknown error')}")
+        report_cache_stats()
+        return
+    
+    try:
+        data = crawler.crawl(url, previous_items=previous_items, checkpoint=checkpoint, resume=resume, batch=batch)
+    finally:
+        checkpoint.close()
     
     if data and data.get("items"):
         with open(output_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4)
+        crawler.save_state()
         print(f"✅ Crawl finished. Scraped {len(data['items'])} items.")
         print(f"Results saved to {output_path}")
     else:
         print(f"❌ Crawling failed for {url}. Reason: {data.get('status', 'Unknown error')}")
+    remove_checkpoint(checkpoint_path)  # Only once the results are on disk
+    report_cache_stats()
+
+def replay_archive(archive_path: str, output_path: str, extractor: str = "auto", workers: int = 4,
+                   local_confidence: float = 0.8):
+    """Re-runs extraction over the pages of a crawl archive, without fetching anything."""
+    if not os.path.exists(archive_path):
+        print(f"❌ Error: File not found at {archive_path}")
+        return
+    print(f"📼 Replaying {archive_path} with the {extractor} extractor")
+    
+    scraper = KadoaInspiredScraper(local_confidence=None if extractor == "llm" else local_confidence)
+    local_only = extractor == "local"
+    items = []
+    pages = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # A bounded window of pages in flight, so the archive is never loaded whole
+        pending = deque()
+        for record in iter_archive(archive_path):
+            pending.append(executor.submit(scraper.extract_archived, record, local_only))
+            if len(pending) >= 2 * workers:
+                items.extend(pending.popleft().result().get("items", []))
+                pages += 1
+        while pending:
+            items.extend(pending.popleft().result().get("items", []))
+            pages += 1
+    
+    items = deduplicate_near(items)
+    if items:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"team_id": scraper.team_id, "items": items}, f, indent=4)
+        print(f"✅ Replayed {pages} pages. {len(items)} items saved to {output_path}")
+    else:
+        print(f"❌ Replayed {pages} pages but no data was extracted.")
+    report_cache_stats()
+
+def finalize(ndjson_path: str, output_path: str, team_id: str = "aline123"):
+    """Builds the standard JSON output from a streamed NDJSON crawl."""
+    if not os.path.exists(ndjson_path):
+        print(f"❌ Error: File not found at {ndjson_path}")
+        return
+    count = finalize_ndjson(ndjson_path, output_path, team_id)
+    print(f"✅ Wrote {count} deduplicated items to {output_path}")
+
+def report_cache_stats():
+    """Prints how many LLM extractions were answered from the local cache."""
+    stats = get_llm_cache().stats()
+    print(f"⚡ LLM cache: {stats['hits']} hits, {stats['misses']} misses")
+
+def report_metrics(metrics_path: str = None, prometheus_path: str = None):
+    """Prints where the run's time and tokens went, and writes the full metrics if asked."""
+    summary = get_metrics().summary(per_url=False)
+    print(f"⏱️ Run report ({summary['elapsed_seconds']:.1f}s):")
+    for stage, timing in summary["stages"].items():
+        print(f"   {stage:<14} {timing['count']:>6} calls  p50 {timing['p50']:.3f}s  p99 {timing['p99']:.3f}s  total {timing['total_seconds']:.1f}s")
+    for stage, usage in summary["tokens"].items():
+        print(f"   {stage:<14} {usage['prompt_tokens']:>8} prompt + {usage['completion_tokens']} completion tokens in {usage['calls']} LLM calls")
+    if summary["counters"].get("bytes_fetched"):
+        print(f"   fetched {summary['counters']['pages_fetched']} pages, {summary['counters']['bytes_fetched'] / 1e6:.2f} MB")
+    if metrics_path:
+        get_metrics().write(metrics_path)
+        print(f"📊 Metrics saved to {metrics_path}")
+    if prometheus_path:
+        get_metrics().write_prometheus(prometheus_path)
+        print(f"📊 Prometheus metrics saved to {prometheus_path}")
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--metrics", type=str, default=None, help="Save per-stage and per-URL metrics to this file (.csv for a per-stage CSV, JSON otherwise)")
+    parser.add_argument("--prometheus", type=str, default=None, help="Save the metrics in Prometheus text format to this file")
 
 def main():
     """Main function to handle command-line arguments."""
@@ -59,14 +214,53 @@ def main():
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Scrape PDF command
-    parser_pdf = subparsers.add_parser("scrape_pdf", help="Scrape a single PDF file")
-    parser_pdf.add_argument("file_path", type=str, help="The local path to the PDF file")
+    parser_pdf = subparsers.add_parser("scrape_pdf", help="Scrape a PDF file, or every PDF in a directory or glob")
+    parser_pdf.add_argument("file_path", type=str, help="The local path to a PDF file, a directory of PDFs, or a glob such as 'books/*.pdf'")
     parser_pdf.add_argument("--output", type=str, default="scraped_data.json", help="Path to save the output JSON file")
+    parser_pdf.add_argument("--batch", action="store_true", help="Extract all chunks through the OpenAI Batch API (cheaper, completes within 24h)")
+    parser_pdf.add_argument("--workers", type=int, default=None, help="Processes extracting page text in parallel (default: CPU count)")
+    parser_pdf.add_argument("--concurrency", type=int, default=4, help="Maximum chunks sent to the LLM at once")
+    parser_pdf.add_argument("--chunk-tokens", type=int, default=2500, dest="chunk_tokens", help="Target size of each chunk in tokens")
+    parser_pdf.add_argument("--overlap-tokens", type=int, default=150, dest="overlap_tokens", help="Tokens repeated between chunks cut mid-section")
+    add_metrics_arguments(parser_pdf)
 
     # Crawl site command
     parser_crawl = subparsers.add_parser("crawl_site", help="Crawl and scrape an entire website starting from a base URL")
     parser_crawl.add_argument("url", type=str, help="The base URL of the website to crawl")
     parser_crawl.add_argument("--output", type=str, default="crawled_data.json", help="Path to save the output JSON file")
+    parser_crawl.add_argument("--workers", type=int, default=1, help="Number of URLs to scrape in parallel")
+    parser_crawl.add_argument("--fetch-workers", type=int, default=None, dest="fetch_workers", help="Pages downloaded in parallel (default: --workers)")
+    parser_crawl.add_argument("--parse-workers", type=int, default=None, dest="parse_workers", help="Pages parsed in parallel (default: --workers, at most the CPU count)")
+    parser_crawl.add_argument("--extract-workers", type=int, default=None, dest="extract_workers", help="Pages sent to the LLM in parallel (default: --workers)")
+    parser_crawl.add_argument("--queue-size", type=int, default=None, dest="queue_size", help="Pages that may wait in front of each pipeline stage (default: twice its workers)")
+    parser_crawl.add_argument("--per-host", type=int, default=4, dest="per_host", help="Maximum parallel requests to a single host")
+    parser_crawl.add_argument("--rps", type=float, default=2.0, help="Maximum requests per second to a single host (robots.txt Crawl-delay may lower it)")
+    parser_crawl.add_argument("--max-depth", type=int, default=3, dest="max_depth", help="Without a sitemap: how many links deep to follow from the base URL")
+    parser_crawl.add_argument("--max-pages", type=int, default=500, dest="max_pages", help="Without a sitemap: maximum number of pages to crawl")
+    parser_crawl.add_argument("--format", type=str, choices=["json", "ndjson"], default="json", dest="output_format",
+                              help="json writes one document at the end; ndjson streams each item as it is scraped")
+    parser_crawl.add_argument("--batch", action="store_true", help="Fetch every page first, then extract them all through the OpenAI Batch API (cheaper, completes within 24h)")
+    parser_crawl.add_argument("--resume", action="store_true", help="Continue an interrupted crawl into the same --output instead of starting over")
+    parser_crawl.add_argument("--incremental", action="store_true", help="Only re-scrape pages that changed since the last crawl into --output")
+    parser_crawl.add_argument("--archive", type=str, default=None, help="Append the raw HTML of every fetched page to this archive (e.g. pages.jsonl.gz) for replay_archive")
+    add_metrics_arguments(parser_crawl)
+
+    # Replay archive command
+    parser_replay = subparsers.add_parser("replay_archive", help="Re-run extraction over a crawl's page archive, without fetching anything")
+    parser_replay.add_argument("archive_path", type=str, help="The archive written by crawl_site --archive")
+    parser_replay.add_argument("--output", type=str, default="replayed_data.json", help="Path to save the output JSON file")
+    parser_replay.add_argument("--extractor", type=str, choices=["auto", "llm", "local"], default="auto",
+                               help="auto: local extractor, then the LLM (like a crawl); llm: always the LLM; local: only the local extractor")
+    parser_replay.add_argument("--workers", type=int, default=4, help="Pages extracted in parallel")
+    parser_replay.add_argument("--local-confidence", type=float, default=0.8, dest="local_confidence",
+                               help="Minimum confidence for a local extraction to be used")
+    add_metrics_arguments(parser_replay)
+
+    # Finalize command
+    parser_finalize = subparsers.add_parser("finalize", help="Convert a streamed NDJSON crawl into the standard JSON output")
+    parser_finalize.add_argument("ndjson_path", type=str, help="The NDJSON file written by crawl_site --format ndjson")
+    parser_finalize.add_argument("--output", type=str, default="crawled_data.json", help="Path to save the output JSON file")
+    parser_finalize.add_argument("--team-id", type=str, default="aline123", dest="team_id", help="team_id for the output document")
 
     # API key command
     parser_api_key = subparsers.add_parser("set_api_key", help="Set and store the OpenAI API key")
@@ -80,17 +274,37 @@ def main():
         if not api_key_manager.get_api_key():
             print("OpenAI API key not found. Please set it using the 'set_api_key' command.")
             return
-        scrape_pdf(args.file_path, args.output)
+        scrape_pdf(args.file_path, args.output, batch=args.batch, workers=args.workers, concurrency=args.concurrency,
+                   chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens)
     elif args.command == "crawl_site":
+        if args.rps <= 0:
+            parser.error("--rps must be greater than 0")
+        if not api_key_manager.get_api_key():
+            print("OpenAI API key not found. Please set it using the 'set_api_key' command.")
+            return
+        crawl_site(args.url, args.output, workers=args.workers, per_host_limit=args.per_host, incremental=args.incremental,
+                   requests_per_second=args.rps, output_format=args.output_format,
+                   resume=args.resume, batch=args.batch, max_depth=args.max_depth, max_pages=args.max_pages,
+                   stage_workers={"fetch_workers": args.fetch_workers, "parse_workers": args.parse_workers,
+                                  "extract_workers": args.extract_workers, "queue_size": args.queue_size},
+                   archive_path=args.archive)
+    elif args.command == "replay_archive":
         if not api_key_manager.get_api_key():
             print("OpenAI API key not found. Please set it using the 'set_api_key' command.")
             return
-        crawl_site(args.url, args.output)
+        replay_archive(args.archive_path, args.output, extractor=args.extractor, workers=args.workers,
+                       local_confidence=args.local_confidence)
+    elif args.command == "finalize":
+        finalize(args.ndjson_path, args.output, team_id=args.team_id)
     elif args.command == "set_api_key":
         api_key_manager.set_api_key(args.api_key)
         print("API key has been set successfully.")
     else:
         parser.print_help()
+        return
+    
+    if args.command in ("scrape_pdf", "crawl_site", "replay_archive"):
+        report_metrics(args.metrics, args.prometheus)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
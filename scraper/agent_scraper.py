@@ -6,19 +6,35 @@ Core concepts: AI orchestration, self-healing, adaptive strategies
 
 import json
 import time
+import hashlib
 import random
 import logging
-from typing import Dict, List, Optional
-import requests
-from bs4 import BeautifulSoup
+from typing import Dict, List, Optional, Union
 import openai
-from playwright.sync_api import sync_playwright
 from urllib.parse import urlparse
 from api_key_manager import get_openai_api_key
+from strategy_store import StrategyStore
+from llm_cache import LLMCache, get_llm_cache
+from browser_pool import BrowserPool
+from http_client import HTTPClient
+from rate_limiter import HostRateLimiter
+from local_extractor import extract_locally
+from content_windowing import split_into_windows
+from html_parser import ParsedPage, parse_html
+from near_dup import MIN_FINGERPRINT_WORDS, NearDuplicateIndex, simhash
+from llm_dispatch import LLMDispatcher, LLMUnavailable, get_llm_dispatcher
+from metrics import Metrics, get_metrics
+from page_archive import PageArchive
+from scrape_result import ScrapeResult, extraction_failure, failure_of, fetch_failure, is_retryable_extraction
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+MAX_STRATEGY_ATTEMPTS = 3  # Strategies tried per URL before giving up
+MAX_EXTRACTION_ATTEMPTS = 3  # LLM extractions tried on one fetched page before giving up
+# Escalation order used when the strategy agent cannot be reached
+STRATEGY_LADDER = ["headers_rotation", "browser_automation", "stealth_browser"]
+
 class KadoaInspiredScraper:
     """
     AI-orchestrated scraper inspired by Kadoa's approach:
@@ -27,51 +43,117 @@ class KadoaInspiredScraper:
     3. Automated data transformation
     """
     
-    def __init__(self, team_id: str = "aline123"):
+    def __init__(self, team_id: str = "aline123", memory_path: Optional[str] = None, cache: Optional[LLMCache] = None,
+                 browser_pool_size: int = 2, http_pool_size: int = 10, requests_per_second: float = 2.0,
+                 local_confidence: Optional[float] = 0.8, window_tokens: int = 2500, max_windows: int = 4,
+                 html_backend: Optional[str] = None, llm: Optional[LLMDispatcher] = None,
+                 archive: Optional[PageArchive] = None, metrics: Optional[Metrics] = None):
         self.team_id = team_id
-        self.client = openai.OpenAI(api_key=get_openai_api_key())
-        self.website_memory = {}  # Store what works for each site
+        self.client = openai.OpenAI(api_key=get_openai_api_key())  # Batch API jobs
+        self.llm = llm or get_llm_dispatcher()  # Rate-limit-aware chat completions, shared across threads
+        self.website_memory = StrategyStore(memory_path)  # Persisted record of what works for each site
+        self.cache = cache or get_llm_cache()  # Extraction responses keyed by request hash
+        self.browser_pool = BrowserPool(size=browser_pool_size)  # Started on first browser strategy
+        self.rate_limiter = HostRateLimiter(requests_per_second)  # Per-host politeness for every fetch
+        self.http = HTTPClient(pool_maxsize=http_pool_size, rate_limiter=self.rate_limiter)  # Shared keep-alive pool for static fetches
+        self.local_confidence = local_confidence  # Minimum confidence to skip the LLM (None = always use the LLM)
+        self.window_tokens = window_tokens  # Token budget of the page text sent per extraction request
+        self.max_windows = max_windows  # Requests per page at most; caps the per-page token cost
+        self.html_backend = html_backend  # Parser for fetched pages (None = fastest installed)
+        self.page_index = NearDuplicateIndex()  # Fingerprints of pages already sent to the LLM
+        self.archive = archive  # Every fetched page is appended here for offline replay (None = not kept)
+        self.metrics = metrics or get_metrics()  # Stage timings, bytes and tokens of the run
+    
+    def close(self):
+        """Shut down pooled browsers and save the website memory"""
+        self.browser_pool.close()
+        self.website_memory.flush()
     
-    def scrape_with_ai_orchestration(self, url: str) -> Dict:
+    def scrape_with_ai_orchestration(self, url: str, validators: Optional[Dict] = None) -> ScrapeResult:
         """
         Main method: AI decides strategy, executes, learns from results
+
+        `validators` (etag, last_modified, content_hash) from a previous crawl turn the
+        fetch into a conditional one; an unchanged page comes back with status "not_modified".
+        Only a failed fetch moves on to the next strategy: a failed extraction is
+        retried on the page already downloaded.
         """
         logger.info(f"🤖 AI Orchestration starting for: {url}")
         
-        domain = urlparse(url).netloc
         attempts = []
         
-        for attempt in range(3):
-            # AI Agent 1: Strategy Selection
-            strategy = self._ai_choose_strategy(url, attempts)
-            logger.info(f"🎯 AI chose: {strategy['method']} - {strategy['reasoning']}")
+        for _ in range(MAX_STRATEGY_ATTEMPTS):
+            strategy = self.choose_strategy(url, attempts)
             
             # Execute chosen strategy
-            result = self._execute_strategy(url, strategy)
+            started = time.perf_counter()
+            fetched = self.fetch_page(url, strategy, validators)
+            latency = time.perf_counter() - started
+            result = self.extract_fetched(fetched, url, validators)
             
-            if result and result.get('items'):
-                # Success! Learn from it
-                self._update_memory(domain, strategy['method'], True)
-                logger.info(f"✅ Success with {strategy['method']}")
+            if self.record_attempt(url, strategy, result, latency, attempts):
                 return result
-            else:
-                # Failed, record and try again
-                attempts.append({
-                    'method': strategy['method'],
-                    'success': False,
-                    'attempt': attempt + 1
-                })
-                self._update_memory(domain, strategy['method'], False)
-                logger.warning(f"❌ {strategy['method']} failed, trying next...")
         
-        return {"team_id": self.team_id, "items": [], "status": "all_strategies_failed"}
+        return self.failed_result()
+    
+    def choose_strategy(self, url: str, previous_attempts: List[Dict]) -> Dict:
+        """Fast path: reuse a proven method, otherwise ask AI Agent 1"""
+        with self.metrics.timer("strategy", url):
+            strategy = self._remembered_strategy(urlparse(url).netloc, previous_attempts) or self._ai_choose_strategy(url, previous_attempts)
+        logger.info(f"🎯 AI chose: {strategy['method']} - {strategy['reasoning']}")
+        return strategy
+    
+    def record_attempt(self, url: str, strategy: Dict, result: Optional[ScrapeResult], latency: float, attempts: List[Dict]) -> bool:
+        """
+        Learn from one strategy attempt and return whether the URL is done.
+        A failed fetch is appended to `attempts`, so the next choice escalates.
+        A failed extraction ends the URL: the strategy did its job, and another
+        one would only download the same page again.
+        """
+        domain = urlparse(url).netloc
+        failure = failure_of(result)
+        if failure == 'extraction':
+            self._update_memory(domain, strategy['method'], True, latency)
+            logger.warning(f"🧩 {strategy['method']} fetched the page but extraction failed, not refetching: {url}")
+            return True
+        if failure is None:
+            # Success! Learn from it
+            self._update_memory(domain, strategy['method'], True, latency)
+            logger.info(f"✅ Success with {strategy['method']}")
+            return True
+        
+        # Fetch failed (or the page came back without content), record and try again
+        attempts.append({
+            'method': strategy['method'],
+            'success': False,
+            'attempt': len(attempts) + 1
+        })
+        self._update_memory(domain, strategy['method'], False, latency)
+        logger.warning(f"❌ {strategy['method']} failed, trying next...")
+        return False
+    
+    def failed_result(self) -> ScrapeResult:
+        """Result for a URL no strategy could scrape"""
+        return {"team_id": self.team_id, "items": [], "status": "all_strategies_failed", "failure": "fetch"}
+    
+    def _remembered_strategy(self, domain: str, previous_attempts: List[Dict]) -> Optional[Dict]:
+        """
+        Skip the strategy LLM call when memory has a confident winner for this domain.
+        Only used for the first attempt; retries go back to the AI agent.
+        """
+        if previous_attempts:
+            return None
+        method = self.website_memory.best_method(domain)
+        if not method:
+            return None
+        return {"method": method, "reasoning": "Proven winner for this domain (from strategy memory)"}
     
     def _ai_choose_strategy(self, url: str, previous_attempts: List[Dict]) -> Dict:
         """
         AI Agent that chooses the best strategy based on context
         """
         domain = urlparse(url).netloc
-        memory = self.website_memory.get(domain, {})
+        memory = self.website_memory.summary(domain)
         
         context = f"""
 Website: {url}
@@ -93,17 +175,15 @@ Consider:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            content = self.llm.complete({
+                "model": "gpt-4o-mini",
+                "messages": [
                     {"role": "system", "content": "You are an expert web scraping strategist. Return only JSON with 'method' and 'reasoning' fields."},
                     {"role": "user", "content": context}
                 ],
-                max_tokens=200,
-                temperature=0.3
-            )
-            
-            content = response.choices[0].message.content.strip()
+                "max_tokens": 200,
+                "temperature": 0.3
+            }, stage="strategy", url=url).strip()
             # Clean up potential markdown formatting
             if '```json' in content:
                 content = content.split('```json')[1].split('```')[0]
@@ -112,6 +192,12 @@ Consider:
             
             return json.loads(content)
             
+        except LLMUnavailable as e:
+            # Escalate without the agent instead of jumping straight to a browser
+            tried = {attempt['method'] for attempt in previous_attempts}
+            method = next((m for m in STRATEGY_LADDER if m not in tried), STRATEGY_LADDER[-1])
+            logger.warning(f"AI strategy selection unavailable ({e}), escalating to {method}")
+            return {"method": method, "reasoning": "Strategy agent rate limited; next method in the ladder"}
         except Exception as e:
             logger.error(f"AI strategy selection failed: {e}")
             # Fallback strategy
@@ -120,177 +206,345 @@ Consider:
                 "reasoning": "Fallback due to AI error"
             }
     
-    def _execute_strategy(self, url: str, strategy: Dict) -> Optional[Dict]:
+    def fetch_page(self, url: str, strategy: Dict, validators: Optional[Dict] = None) -> Dict:
         """
-        Execute the chosen strategy
+        Fetch step of the chosen strategy. Returns {"html", "headers"} for a page still
+        to be extracted, or a finished result: 304 Not Modified, surgically extracted
+        links, or a fetch failure.
         """
         method = strategy['method']
         
-        if method == "simple_requests":
-            return self._simple_requests(url)
-        elif method == "headers_rotation":
-            return self._headers_rotation(url)
-        elif method == "browser_automation":
-            return self._browser_automation(url)
-        elif method == "stealth_browser":
-            return self._stealth_browser(url)
-        else:
-            logger.error(f"Unknown method: {method}")
-            return None
+        with self.metrics.timer("fetch", url):
+            if method == "simple_requests":
+                fetched = self._simple_requests(url, validators)
+            elif method == "headers_rotation":
+                fetched = self._headers_rotation(url, validators)
+            elif method == "browser_automation":
+                fetched = self._browser_automation(url, validators)
+            elif method == "stealth_browser":
+                fetched = self._stealth_browser(url, validators)
+            else:
+                logger.error(f"Unknown method: {method}")
+                fetched = None
+        if fetched is None:
+            return fetch_failure(self.team_id, f"{method} could not fetch {url}")
+        if 'html' in fetched:
+            self.metrics.add_bytes(len(fetched['html'].encode('utf-8')), url)
+            self._archive_page(url, fetched['html'], fetched['headers'], fetched['status'], method)
+        return fetched
+    
+    def _conditional_headers(self, validators: Optional[Dict]) -> Dict:
+        """Build If-None-Match / If-Modified-Since headers from a previous crawl's validators"""
+        headers = {}
+        if validators and validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators and validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+    
+    def _fetched(self, html: str, headers: Optional[Dict] = None, status: int = 200) -> Dict:
+        """A fetched page waiting for extraction"""
+        return {"html": html, "headers": headers or {}, "status": status}
+    
+    def _archive_page(self, url: str, html: str, headers: Optional[Dict], status: int, method: str):
+        if self.archive is not None:
+            self.archive.write(url, html, headers, status, method)
     
-    def _simple_requests(self, url: str) -> Optional[Dict]:
+    def extract_archived(self, record: Dict, local_only: bool = False) -> ScrapeResult:
+        """
+        Re-extract a page read back from a PageArchive, without fetching anything:
+        the same local-then-LLM extraction as a crawl, or only the local extractor.
+        """
+        url = record['url']
+        if local_only:
+            return self.local_extract(record['body'], url) or {"team_id": self.team_id, "items": []}
+        return self.extract_fetched(self._fetched(record['body'], record.get('headers'), record.get('status', 200)), url)
+    
+    def extract_fetched(self, fetched: Dict, url: str, validators: Optional[Dict] = None) -> ScrapeResult:
+        """
+        Extract a page returned by fetch_page (finished results and failures pass through).
+        Skip extraction when the fetched content hashes the same as last crawl,
+        otherwise extract. Either way the result carries the new validators in "fetch_meta"
+        and the page's links (raw href values) in "links".
+
+        A failed extraction is repeated on the page in memory, up to
+        MAX_EXTRACTION_ATTEMPTS times; windows that already succeeded come from the cache.
+        """
+        if 'html' not in fetched:
+            return fetched
+        try:
+            prepared = self.prepare_page(fetched['html'], url, validators, fetched['headers'])
+        except Exception as e:
+            logger.error(f"Extraction failed for {url}: {e}")
+            return extraction_failure(self.team_id, str(e), retryable=False)
+        for attempt in range(1, MAX_EXTRACTION_ATTEMPTS + 1):
+            result = self.extract_prepared(prepared, url, allow_partial=attempt == MAX_EXTRACTION_ATTEMPTS)
+            if not is_retryable_extraction(result):
+                break
+            if attempt < MAX_EXTRACTION_ATTEMPTS:
+                logger.warning(f"🔁 Extraction attempt {attempt} failed for {url}, retrying on the fetched page")
+        return result
+    
+    def prepare_page(self, html: str, url: str, validators: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
+        """
+        CPU-side work on a fetched page, everything short of the LLM call: parse once,
+        compute the new validators, then try what makes the LLM unnecessary (unchanged
+        content hash, local extraction). Returns {"page", "fetch_meta", "links"}, plus
+        the finished "result" when no LLM call is needed.
+        """
+        with self.metrics.timer("parse", url):
+            headers = headers or {}
+            page = self.parse(html)
+            fetch_meta = {
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'content_hash': hashlib.sha256(html.encode('utf-8')).hexdigest()
+            }
+            prepared = {"page": page, "fetch_meta": fetch_meta, "links": page.links()}
+            if validators and validators.get('content_hash') == fetch_meta['content_hash']:
+                logger.info(f"♻️ Content unchanged since last crawl: {url}")
+                prepared['result'] = {"team_id": self.team_id, "items": [], "status": "not_modified"}
+            else:
+                result = self.local_extract(page, url)
+                if result is not None:
+                    self._remember_page(page, url)
+                    prepared['result'] = result
+                else:
+                    page.main_text()  # Boilerplate stripping is CPU work too; do it before an LLM slot is taken
+        
+            if 'result' in prepared:
+                prepared['result']['fetch_meta'] = fetch_meta
+                prepared['result']['links'] = prepared['links']
+            return prepared
+    
+    def extract_prepared(self, prepared: Dict, url: str, allow_partial: bool = True) -> ScrapeResult:
+        """
+        LLM step for a page from prepare_page (AI Agent 2), unless it is already finished.
+        `prepared` is left untouched, so a failed extraction can be run again on it.
+        """
+        if 'result' in prepared:
+            return prepared['result']
+        try:
+            result = self._ai_extract_content(prepared['page'], url, allow_partial)
+        except Exception as e:
+            logger.error(f"AI content extraction failed for {url}: {e}")
+            result = extraction_failure(self.team_id, str(e))
+        if result.get('failure') != 'extraction':  # Otherwise an incremental crawl would skip it next time
+            result['fetch_meta'] = prepared['fetch_meta']
+        result['links'] = prepared['links']
+        return result
+    
+    def _not_modified(self, url: str) -> Dict:
+        """Result for a 304 response to a conditional request"""
+        logger.info(f"♻️ Not modified (304): {url}")
+        return {"team_id": self.team_id, "items": [], "status": "not_modified", "fetch_meta": {}}
+    
+    def _simple_requests(self, url: str, validators: Optional[Dict] = None) -> Optional[Dict]:
         """Basic HTTP requests"""
         try:
-            session = requests.Session()
-            session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            
-            response = session.get(url, timeout=15)
+            response = self.http.get(url, headers=self._conditional_headers(validators))
+            if response.status_code == 304:
+                return self._not_modified(url)
             response.raise_for_status()
             
-            return self._ai_extract_content(response.text, url)
+            return self._fetched(response.text, response.headers, response.status_code)
             
         except Exception as e:
             logger.error(f"Simple requests failed: {e}")
             return None
     
-    def _headers_rotation(self, url: str) -> Optional[Dict]:
-        """Rotate headers and user agents"""
+    def _rotated_headers(self) -> Dict:
+        """Browser-like headers with a randomly chosen user agent"""
         user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         ]
-        
+        # Compression and keep-alive come from the shared session
+        return {
+            'User-Agent': random.choice(user_agents),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Upgrade-Insecure-Requests': '1'
+        }
+    
+    def _headers_rotation(self, url: str, validators: Optional[Dict] = None) -> Optional[Dict]:
+        """Rotate headers and user agents"""
         try:
-            session = requests.Session()
-            session.headers.update({
-                'User-Agent': random.choice(user_agents),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            })
-            
-            # Human-like delay
-            time.sleep(random.uniform(2, 4))
+            headers = {**self._rotated_headers(), **self._conditional_headers(validators)}
             
-            response = session.get(url, timeout=15)
+            # Pacing is handled by the per-host rate limiter inside the HTTP client
+            response = self.http.get(url, headers=headers)
+            if response.status_code == 304:
+                return self._not_modified(url)
             response.raise_for_status()
             
-            return self._ai_extract_content(response.text, url)
+            return self._fetched(response.text, response.headers, response.status_code)
             
         except Exception as e:
             logger.error(f"Headers rotation failed: {e}")
             return None
     
-    def _browser_automation(self, url: str) -> Optional[Dict]:
+    def _browser_automation(self, url: str, validators: Optional[Dict] = None) -> Optional[Dict]:
         """Use Playwright browser automation with surgical link extraction for known complex sites."""
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                
-                page.set_extra_http_headers({
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                })
-                
-                page.goto(url, wait_until='networkidle')
+        def visit(context):
+            page = context.new_page()
+            
+            page.set_extra_http_headers({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            })
+            
+            page.goto(url, wait_until='networkidle')
 
-                # Surgical extraction for the problematic "Company Guides" page
-                if "topics#companies" in url:
-                    logger.info("Applying surgical extraction for Company Guides...")
-                    guide_links = page.evaluate("""() => {
-                        const links = [];
-                        const guideSections = document.querySelectorAll('h3');
-                        guideSections.forEach(h3 => {
-                            if (h3.textContent.includes('Company-specific guides')) {
-                                let currentElement = h3.nextElementSibling;
-                                while (currentElement && currentElement.tagName === 'A') {
-                                    links.push({
-                                        title: currentElement.textContent.trim(),
-                                        url: currentElement.href
-                                    });
-                                    currentElement = currentElement.nextElementSibling;
-                                }
+            # Surgical extraction for the problematic "Company Guides" page
+            if "topics#companies" in url:
+                logger.info("Applying surgical extraction for Company Guides...")
+                guide_links = page.evaluate("""() => {
+                    const links = [];
+                    const guideSections = document.querySelectorAll('h3');
+                    guideSections.forEach(h3 => {
+                        if (h3.textContent.includes('Company-specific guides')) {
+                            let currentElement = h3.nextElementSibling;
+                            while (currentElement && currentElement.tagName === 'A') {
+                                links.push({
+                                    title: currentElement.textContent.trim(),
+                                    url: currentElement.href
+                                });
+                                currentElement = currentElement.nextElementSibling;
                             }
-                        });
-                        return links;
-                    }""")
-                    
-                    items = []
-                    for link in guide_links:
-                        items.append({
-                            "title": link['title'],
-                            "content": f"A company-specific interview guide for {link['title']}.",
-                            "content_type": "blog",
-                            "source_url": link['url'],
-                            "author": "Unknown",
-                            "user_id": ""
-                        })
-                    
-                    browser.close()
-                    return {"team_id": self.team_id, "items": items}
+                        }
+                    });
+                    return links;
+                }""")
+                return guide_links, None
 
-                # Fallback to general content extraction for other sites
-                content = page.content()
-                browser.close()
-                
-                return self._ai_extract_content(content, url)
+            # Fallback to general content extraction for other sites
+            return None, page.content()
+
+        try:
+            self.rate_limiter.acquire(url)
+            # The page is rendered on a pooled browser; extraction runs here so the browser is freed meanwhile
+            guide_links, content = self.browser_pool.run(visit)
+            
+            if guide_links is not None:
+                items = []
+                for link in guide_links:
+                    items.append({
+                        "title": link['title'],
+                        "content": f"A company-specific interview guide for {link['title']}.",
+                        "content_type": "blog",
+                        "source_url": link['url'],
+                        "author": "Unknown",
+                        "user_id": ""
+                    })
+                return {"team_id": self.team_id, "items": items}
+            
+            return self._fetched(content)
                 
         except Exception as e:
             logger.error(f"Browser automation failed: {e}")
             return None
     
-    def _stealth_browser(self, url: str) -> Optional[Dict]:
+    def _render_stealth(self, url: str) -> str:
+        """Render a page on the pooled anti-detection browser and return its HTML"""
+        def visit(context):
+            page = context.new_page()
+            
+            # Anti-detection
+            page.add_init_script("""
+                Object.defineProperty(navigator, 'webdriver', {
+                    get: () => undefined,
+                });
+            """)
+            
+            page.goto(url, wait_until='networkidle')
+            
+            return page.content()
+
+        self.rate_limiter.acquire(url)
+        return self.browser_pool.run(
+            visit,
+            profile="stealth",
+            context_options={
+                'viewport': {'width': 1920, 'height': 1080},
+                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+        )
+    
+    def _stealth_browser(self, url: str, validators: Optional[Dict] = None) -> Optional[Dict]:
         """Advanced stealth browser with anti-detection"""
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-first-run',
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-features=VizDisplayCompositor'
-                    ]
-                )
-                
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                )
-                
-                page = context.new_page()
-                
-                # Anti-detection
-                page.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined,
-                    });
-                """)
-                
-                page.goto(url, wait_until='networkidle')
-                time.sleep(random.uniform(3, 6))  # Human-like delay
-                
-                content = page.content()
-                browser.close()
-                
-                return self._ai_extract_content(content, url)
+            content = self._render_stealth(url)
+            
+            return self._fetched(content)
                 
         except Exception as e:
             logger.error(f"Stealth browser failed: {e}")
             return None
     
-    def _ai_extract_content(self, html: str, url: str) -> Optional[Dict]:
+    def fetch_html(self, url: str) -> Optional[str]:
+        """
+        Fetch a page's HTML without extracting it (used by batch extraction).
+        No strategy LLM call: the domain's proven method goes first, then the
+        methods are tried from cheapest to most sophisticated.
+        """
+        methods = ["simple_requests", "headers_rotation", "stealth_browser"]
+        best = self.website_memory.best_method(urlparse(url).netloc)
+        if best == "browser_automation":
+            best = "stealth_browser"  # Same rendered HTML, without the surgical shortcuts
+        if best in methods:
+            methods.remove(best)
+            methods.insert(0, best)
+        
+        for method in methods:
+            try:
+                with self.metrics.timer("fetch", url):
+                    if method == "stealth_browser":
+                        html, response_headers, status = self._render_stealth(url), {}, 200
+                    else:
+                        headers = self._rotated_headers() if method == "headers_rotation" else None
+                        response = self.http.get(url, headers=headers)
+                        response.raise_for_status()
+                        html, response_headers, status = response.text, response.headers, response.status_code
+                if html and html.strip():
+                    self.metrics.add_bytes(len(html.encode('utf-8')), url)
+                    self._archive_page(url, html, response_headers, status, method)
+                    return html
+            except Exception as e:
+                logger.warning(f"Fetching {url} with {method} failed: {e}")
+        return None
+    
+    def parse(self, html: Union[str, ParsedPage]) -> ParsedPage:
+        """Parse a fetched page once; the tree is shared by every extraction step"""
+        return parse_html(html, self.html_backend) if isinstance(html, str) else html
+    
+    def local_extract(self, html: Union[str, ParsedPage], url: str) -> Optional[Dict]:
+        """
+        Deterministic extraction for well-structured article pages.
+        Returns a result only when confident enough to skip the LLM.
+        """
+        if self.local_confidence is None:
+            return None
+        page = self.parse(html)
+        item, confidence = extract_locally(page.html, url, tree=page.lxml_tree)
+        if item is None or confidence < self.local_confidence:
+            return None
+        logger.info(f"⚡ Extracted locally (confidence {confidence}): {url}")
+        return {"team_id": self.team_id, "items": [item]}
+    
+    def build_extraction_requests(self, html: Union[str, ParsedPage], url: str) -> List[Dict]:
         """
-        AI Agent 2: Extracts structured data from raw HTML
+        Chat completion requests for AI Agent 2, one per content window.
+        Boilerplate (nav, header, footer, asides, scripts) is stripped and only the
+        densest content block is kept; long articles are split into token-budgeted
+        windows whose answers are merged by merge_extractions.
         This has been updated to be more stateless and explicit to prevent data blending.
         """
-        soup = BeautifulSoup(html, "html.parser")
-        body_text = soup.get_text(separator=' ', strip=True)[:10000] # Limit context size
+        body_text = self.parse(html).main_text()
+        windows = split_into_windows(body_text, window_tokens=self.window_tokens, max_windows=self.max_windows) or [""]
+        return [self._extraction_request(url, window, i, len(windows)) for i, window in enumerate(windows)]
 
+    def _extraction_request(self, url: str, body_text: str, part: int, parts: int) -> Dict:
         system_prompt = """
 You are a stateless, single-tasking data extraction expert.
 Your ONLY job is to extract information from the <HTML_CONTENT> provided in THIS request.
@@ -309,37 +563,170 @@ Your ONLY job is to extract information from the <HTML_CONTENT> provided in THIS
   "user_id": ""
 }
 """
+        if parts > 1:
+            system_prompt += """- The content is one part of a longer page. Extract ONLY what is in this part; if it
+  continues an article started in an earlier part, return it as one item with that article's title if known.
+"""
+        part_note = f"Part: {part + 1} of {parts}\n" if parts > 1 else ""
         user_prompt = f"""
 Source URL: {url}
-
+{part_note}
 <HTML_CONTENT>
 {body_text}
 </HTML_CONTENT>
 """
 
+        return {
+            "model": "gpt-4o-mini",
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0,
+            "max_tokens": 4000
+        }
+    
+    def parse_extraction(self, content: str, url: str) -> Dict:
+        """Turn the extraction agent's JSON answer into a result (raises on invalid JSON)"""
+        extracted_data = json.loads(content)
+        
+        # Add team_id to the final output
+        extracted_data["team_id"] = self.team_id
+        
+        # Ensure all items have the source_url populated
+        for item in extracted_data.get("items", []):
+            if not item.get("source_url"):
+                item["source_url"] = url
+
+        return extracted_data
+
+    def merge_extractions(self, results: List[Dict]) -> Dict:
+        """
+        Merge the per-window results of one page.
+        When every window yielded a single item the page is one long article, so the
+        parts are joined under the first window's title and author; otherwise items
+        with the same title are joined and the rest are kept in order.
+        """
+        if len(results) == 1:
+            return results[0]
+        window_items = [result.get("items", []) for result in results]
+        if all(len(items) == 1 for items in window_items):
+            merged = dict(window_items[0][0])
+            merged["content"] = "\n\n".join(items[0].get("content", "") for items in window_items)
+            if merged.get("author", "Unknown") == "Unknown":
+                merged["author"] = next(
+                    (items[0]["author"] for items in window_items if items[0].get("author", "Unknown") != "Unknown"),
+                    "Unknown"
+                )
+            return {"items": [merged], "team_id": self.team_id}
+
+        by_title = {}
+        merged_items = []
+        for items in window_items:
+            for item in items:
+                key = (item.get("title") or "").strip().lower()
+                if key and key in by_title:
+                    by_title[key]["content"] += "\n\n" + item.get("content", "")
+                    continue
+                item = dict(item)
+                if key:
+                    by_title[key] = item
+                merged_items.append(item)
+        return {"items": merged_items, "team_id": self.team_id}
+    
+    def page_fingerprint(self, page: ParsedPage) -> Optional[int]:
+        """SimHash of the page's main text; None when it is too short to compare reliably"""
+        text = page.main_text()
+        if len(text.split()) < MIN_FINGERPRINT_WORDS:
+            return None
+        return simhash(text)
+
+    def near_duplicate_of(self, html: Union[str, ParsedPage], url: str, remember: bool = False) -> Optional[str]:
+        """
+        URL of an already extracted page whose main text is a near-duplicate of this
+        one (paginated copies, syndicated posts), so its extraction can be skipped.
+        With `remember`, a page that is not a duplicate is recorded right away.
+        """
+        with self.metrics.timer("dedup", url):
+            return self.fingerprint_duplicate_of(self.page_fingerprint(self.parse(html)), url, remember)
+
+    def fingerprint_duplicate_of(self, fingerprint: Optional[int], url: str, remember: bool = False) -> Optional[str]:
+        """near_duplicate_of() for a page whose page_fingerprint() was computed beforehand"""
+        if fingerprint is None:
+            return None
+        if remember:
+            duplicate = self.page_index.find_or_add(fingerprint, url)
+        else:
+            duplicate = self.page_index.find(fingerprint)
+        return duplicate if duplicate != url else None
+
+    def _remember_page(self, page: ParsedPage, url: str):
+        """Only pages extracted successfully make later copies skippable"""
+        fingerprint = self.page_fingerprint(page)
+        if fingerprint is not None:
+            self.page_index.add(fingerprint, url)
+
+    def _near_duplicate(self, url: str, original: str) -> Dict:
+        """Result for a page whose content was already extracted from another URL"""
+        logger.info(f"🪞 Near-duplicate of {original}, skipping extraction: {url}")
+        return {"team_id": self.team_id, "items": [], "status": "near_duplicate", "duplicate_of": original}
+    
+    def _llm_unavailable(self, url: str, error: Exception) -> ScrapeResult:
+        """Result for a fetched page the LLM could not extract, even after backing off"""
+        logger.error(f"⏳ LLM unavailable, not extracted: {url} ({error})")
+        # The dispatcher already backed off; retrying right away would not get through either
+        return extraction_failure(self.team_id, str(error), retryable=False, status="llm_unavailable")
+    
+    def _ai_extract_content(self, html: Union[str, ParsedPage], url: str, allow_partial: bool = True) -> ScrapeResult:
+        """
+        AI Agent 2: Extracts structured data from raw HTML, one request per content window.
+        Windows whose answer is unusable make it an extraction failure, unless
+        `allow_partial` and other windows succeeded.
+        """
+        page = self.parse(html)
+        original = self.near_duplicate_of(page, url)
+        if original:
+            return self._near_duplicate(url, original)
+
+        requests = self.build_extraction_requests(page, url)
+        if len(requests) > 1:
+            logger.info(f"🪟 Extracting {url} in {len(requests)} windows")
+        results = []
+        failed = 0
         try:
-            logger.info("🤖 AI is extracting content...")
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0,
-                max_tokens=4000
-            )
+            with self.metrics.timer("extract", url):
+                for request in requests:
+                    extracted_data = self._ai_extract_window(request, url)
+                    if extracted_data is not None:
+                        results.append(extracted_data)
+                    else:
+                        failed += 1
+        except LLMUnavailable as e:
+            # Windows that did succeed are cached, so a later retry only pays for the rest
+            return self._llm_unavailable(url, e)
+        if failed and (not results or not allow_partial):
+            return extraction_failure(self.team_id, f"{failed} of {len(requests)} extraction windows failed")
+        self._remember_page(page, url)
+        return self.merge_extractions(results)
 
-            content = response.choices[0].message.content
-            extracted_data = json.loads(content)
-            
-            # Add team_id to the final output
-            extracted_data["team_id"] = self.team_id
-            
-            # Ensure all items have the source_url populated
-            for item in extracted_data.get("items", []):
-                if not item.get("source_url"):
-                    item["source_url"] = url
+    def _ai_extract_window(self, request: Dict, url: str) -> Optional[Dict]:
+        cache_key = self.cache.make_key(**request)
+        content = None
+
+        try:
+            content = self.cache.get(cache_key)
+            cached = content is not None
+            if cached:
+                logger.info("⚡ Extraction served from cache")
+            else:
+                logger.info("🤖 AI is extracting content...")
+                content = self.llm.complete(request, stage="extract", url=url)
+
+            extracted_data = self.parse_extraction(content, url)
+            # Only cache fresh responses that parsed, so a bad answer is retried next time
+            if not cached:
+                self.cache.set(cache_key, content)
 
             return extracted_data
 
@@ -347,26 +734,17 @@ Source URL: {url}
             logger.error(f"AI content extraction failed: Invalid JSON response - {e}")
             logger.debug(f"Invalid JSON received from AI: {content}")
             return None
+        except LLMUnavailable:
+            raise
         except Exception as e:
             logger.error(f"AI content extraction failed: {e}")
             return None
     
-    def _update_memory(self, domain: str, method: str, success: bool):
+    def _update_memory(self, domain: str, method: str, success: bool, latency: float = 0.0):
         """
         Self-healing: Update memory about what works for each domain
         """
-        if domain not in self.website_memory:
-            self.website_memory[domain] = {"successful": [], "failed": []}
-        
-        if success:
-            if method not in self.website_memory[domain]["successful"]:
-                self.website_memory[domain]["successful"].append(method)
-            # Remove from failed if it's now working
-            if method in self.website_memory[domain]["failed"]:
-                self.website_memory[domain]["failed"].remove(method)
-        else:
-            if method not in self.website_memory[domain]["failed"]:
-                self.website_memory[domain]["failed"].append(method)
+        self.website_memory.record(domain, method, success, latency)
 
 def main():
     """Test the Kadoa-inspired scraper"""
@@ -401,7 +779,8 @@ def main():
     
     print(f"\n🎉 Kadoa-inspired scraping complete!")
     print(f"📊 Results saved to kadoa_inspired_results.json")
-    print(f"🧠 Website memory: {scraper.website_memory}")
+    print(f"🧠 Website memory: {scraper.website_memory.domains}")
+    scraper.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from llm_cache import LLMCache
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+MAX_REQUESTS_PER_BATCH = 50000  # OpenAI limit per batch input file
+MAX_BYTES_PER_BATCH = 190 * 1000 * 1000  # Below OpenAI's 200 MB limit per batch input file
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+class BatchExtractor:
+    """
+    Runs chat completion requests through the OpenAI Batch API instead of one
+    synchronous call each: requests are written to a JSONL file as they are added,
+    submitted together, polled until done, and the answers mapped back by custom_id.
+    Batches trade latency (up to `completion_window`) for half-price tokens and no
+    per-minute rate limits. The client's base URL decides where it is sent, so a
+    local stub server can stand in for the API.
+
+    Requests already answered in the LLM cache never reach the batch. With
+    `metrics`, the token usage of each answer is recorded under `stage`, and
+    failed requests are counted in the batch_request_errors counter.
+    """
+
+    def __init__(self, client, cache: Optional[LLMCache] = None, poll_interval: float = 30,
+                 completion_window: str = "24h", workdir: Optional[str] = None,
+                 metrics: Optional[Metrics] = None, stage: str = "batch_extract"):
+        self.client = client
+        self.cache = cache
+        self.metrics = metrics
+        self.stage = stage
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self._dir = tempfile.mkdtemp(prefix="batch_", dir=workdir)
+        self._files = []
+        self._pending = 0
+        self._bytes = 0  # Written to the current file
+        self._cache_keys = {}
+        self._discarded = set()  # Queued requests that are no longer needed
+        self._lock = threading.Lock()  # Pages may be added from several fetch threads
+        self.results = {}
+
+    def add(self, custom_id: str, request: Dict):
+        """Queue one chat completion request (the kwargs of chat.completions.create)"""
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(**request)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                with self._lock:
+                    self.results[custom_id] = cached
+                return
+
+        line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": request}
+        data = (json.dumps(line) + "\n").encode("utf-8")
+        with self._lock:
+            if cache_key:
+                self._cache_keys[custom_id] = cache_key
+            # A new file starts before either the request or the size limit is reached
+            if (not self._files or self._pending >= MAX_REQUESTS_PER_BATCH
+                    or (self._pending and self._bytes + len(data) > MAX_BYTES_PER_BATCH)):
+                self._files.append(os.path.join(self._dir, f"requests_{len(self._files)}.jsonl"))
+                self._pending = 0
+                self._bytes = 0
+            with open(self._files[-1], "ab") as f:
+                f.write(data)
+            self._pending += 1
+            self._bytes += len(data)
+
+    def discard(self, custom_id: str):
+        """Drop a queued request before submission (e.g. a page found to be a near-duplicate)"""
+        with self._lock:
+            self._discarded.add(custom_id)
+            self.results.pop(custom_id, None)
+            self._cache_keys.pop(custom_id, None)
+
+    def _upload_path(self, path: str) -> Optional[str]:
+        """The file to upload for `path`: a copy without the discarded requests, None when none are left"""
+        if not self._discarded:
+            return path
+        kept_path = path + ".kept"
+        kept = 0
+        with open(path, "rb") as src, open(kept_path, "wb") as dst:
+            for line in src:
+                if json.loads(line)["custom_id"] not in self._discarded:
+                    dst.write(line)
+                    kept += 1
+        return kept_path if kept else None
+
+    def run(self) -> Dict[str, Optional[str]]:
+        """
+        Submit every queued request, wait for the batches to finish and return
+        {custom_id: response content}. Requests that failed map to None, and
+        their errors (from the batch's error file) are logged.
+        """
+        try:
+            batch_ids = []
+            for path in self._files:
+                path = self._upload_path(path)
+                if path is None:
+                    continue
+                with open(path, "rb") as f:
+                    input_file = self.client.files.create(file=f, purpose="batch")
+                batch = self.client.batches.create(
+                    input_file_id=input_file.id,
+                    endpoint=BATCH_ENDPOINT,
+                    completion_window=self.completion_window
+                )
+                logger.info(f"📦 Submitted batch {batch.id} ({path})")
+                batch_ids.append(batch.id)
+
+            for batch_id in batch_ids:
+                batch = self._wait(batch_id)
+                if batch.status != "completed":
+                    errors = getattr(batch, "errors", None)
+                    details = "; ".join(error.message for error in errors.data or []) if errors else ""
+                    logger.error(f"Batch {batch_id} ended with status {batch.status}" + (f": {details}" if details else ""))
+                # Expired and cancelled batches still return the requests that finished
+                if batch.output_file_id:
+                    self._collect(self.client.files.content(batch.output_file_id).text)
+                if getattr(batch, "error_file_id", None):
+                    self._collect(self.client.files.content(batch.error_file_id).text)
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        return self.results
+
+    def _wait(self, batch_id: str):
+        """Poll a batch until it reaches a terminal status"""
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            counts = batch.request_counts
+            if counts:
+                logger.info(f"⏳ Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done)")
+            time.sleep(self.poll_interval)
+
+    def _collect(self, output_text: str):
+        """Map each line of a batch output or error file back to its custom_id"""
+        for line in output_text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record["custom_id"]
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                error = record.get("error") or (response.get("body") or {}).get("error") or {}
+                message = error.get("message") if isinstance(error, dict) else error
+                status = f" (status {response['status_code']})" if response.get("status_code") else ""
+                logger.error(f"Batch request {custom_id} failed{status}: {message}")
+                self.results[custom_id] = None
+                if self.metrics is not None:
+                    self.metrics.increment("batch_request_errors")
+                continue
+            self.results[custom_id] = response["body"]["choices"][0]["message"]["content"]
+            if self.metrics is not None:
+                self.metrics.record_tokens(self.stage, response["body"].get("usage"))
+
+    def remember(self, custom_id: str):
+        """Cache a batch answer once the caller has parsed it successfully"""
+        cache_key = self._cache_keys.get(custom_id)
+        if self.cache is not None and cache_key and self.results.get(custom_id) is not None:
+            self.cache.set(cache_key, self.results[custom_id])
@@ -0,0 +1,123 @@
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from playwright.sync_api import sync_playwright
+
+logger = logging.getLogger(__name__)
+
+# Chromium launch options for each browser profile the scraper uses
+LAUNCH_PROFILES = {
+    "default": {"headless": True},
+    "stealth": {
+        "headless": True,
+        "args": [
+            '--no-first-run',
+            '--disable-blink-features=AutomationControlled',
+            '--disable-features=VizDisplayCompositor'
+        ]
+    },
+}
+
+class BrowserPool:
+    """
+    Long-lived Chromium browsers shared by the browser-based strategies.
+
+    Playwright's sync API is bound to the thread that started it, so every browser
+    lives on its own worker thread and callers hand it jobs. Each job gets a fresh,
+    isolated browser context; a browser is relaunched after `max_uses` jobs or
+    when it crashes. Workers start lazily on the first job and stop on `close()`.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 50):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def run(self, job: Callable, profile: str = "default", context_options: Optional[Dict] = None):
+        """Run `job(context)` on a pooled browser and return its result (or raise its error)"""
+        self._ensure_started()
+        future = Future()
+        self._jobs.put((job, profile, context_options or {}, future))
+        return future.result()
+
+    def close(self):
+        """Shut down every browser; the pool restarts if used again"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            for _ in threads:
+                self._jobs.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _ensure_started(self):
+        with self._lock:
+            while len(self._threads) < self.size:
+                thread = threading.Thread(target=self._worker, name=f"browser-pool-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        """Owns one Playwright instance and serves jobs until it receives the stop sentinel"""
+        try:
+            playwright = sync_playwright().start()
+        except Exception as e:
+            logger.error(f"Could not start Playwright: {e}")
+            self._fail_jobs(e)
+            return
+
+        browsers = {}
+        uses = {}
+        try:
+            while True:
+                task = self._jobs.get()
+                if task is None:
+                    break
+                job, profile, context_options, future = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                browser = browsers.get(profile)
+                try:
+                    if browser is None or not browser.is_connected() or uses[profile] >= self.max_uses:
+                        if browser is not None:
+                            self._close_quietly(browser)
+                        browser = playwright.chromium.launch(**LAUNCH_PROFILES[profile])
+                        browsers[profile] = browser
+                        uses[profile] = 0
+                    uses[profile] += 1
+
+                    context = browser.new_context(**context_options)
+                    try:
+                        future.set_result(job(context))
+                    finally:
+                        self._close_quietly(context)
+                except Exception as e:
+                    future.set_exception(e)
+                    if browser is not None and not browser.is_connected():
+                        logger.warning(f"Browser '{profile}' crashed, it will be relaunched")
+                        browsers.pop(profile, None)
+        finally:
+            for browser in browsers.values():
+                self._close_quietly(browser)
+            playwright.stop()
+
+    def _fail_jobs(self, error: Exception):
+        """Fail every job this worker picks up when Playwright could not start"""
+        while True:
+            task = self._jobs.get()
+            if task is None:
+                return
+            future = task[3]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    @staticmethod
+    def _close_quietly(resource):
+        try:
+            resource.close()
+        except Exception as e:
+            logger.debug(f"Ignoring error while closing browser resource: {e}")
@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+
+class CrawlCheckpoint:
+    """
+    SQLite checkpoint of a crawl's URL frontier and per-URL completion status.
+
+    URLs are added to the frontier as discovery streams them in, and every URL is
+    marked as it completes together with its result, so an interrupted crawl can
+    resume without re-scraping finished pages (or re-discovering, once discovery
+    has completed).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "url TEXT PRIMARY KEY, position INTEGER NOT NULL, lastmod TEXT, "
+            "status TEXT NOT NULL DEFAULT 'pending', result TEXT, links TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(frontier)")}
+        if "links" not in columns:  # Checkpoints written before link-following crawls
+            self._db.execute("ALTER TABLE frontier ADD COLUMN links TEXT")
+        self._db.commit()
+        self._next_position = self._db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM frontier").fetchone()[0]
+
+    def has_frontier(self, base_url: str) -> bool:
+        """True when a frontier for `base_url` was saved by an earlier run."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'base_url'").fetchone()
+            return bool(row and row[0] == base_url)
+
+    def discovery_complete(self) -> bool:
+        """True when the saved frontier holds every discovered URL."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'discovered'").fetchone()
+            return row is not None
+
+    def start(self, base_url: str, urls: list[str] = (), lastmods: dict | None = None):
+        """Replaces any previous checkpoint with a fresh frontier of pending URLs."""
+        lastmods = lastmods or {}
+        with self._lock:
+            self._db.execute("DELETE FROM frontier")
+            self._db.execute("DELETE FROM meta")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO frontier (url, position, lastmod) VALUES (?, ?, ?)",
+                [(url, i, lastmods.get(url)) for i, url in enumerate(urls)],
+            )
+            self._next_position = len(urls)
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('base_url', ?)", (base_url,))
+            self._db.commit()
+
+    def add(self, url: str, lastmod: str | None = None):
+        """Appends a newly discovered URL to the frontier (no-op if already there)."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO frontier (url, position, lastmod) VALUES (?, ?, ?)",
+                (url, self._next_position, lastmod),
+            )
+            self._next_position += cursor.rowcount
+            self._db.commit()
+
+    def finish_discovery(self):
+        """Marks the frontier complete, so a resume does not discover again."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('discovered', '1')")
+            self._db.commit()
+
+    def frontier(self) -> tuple[list[str], dict]:
+        """The saved URLs in their original order, and their sitemap lastmods."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, lastmod FROM frontier ORDER BY position").fetchall()
+        return [url for url, _ in rows], {url: lastmod for url, lastmod in rows if lastmod}
+
+    def completed(self) -> dict:
+        """Results of the URLs already finished, keyed by URL (None = unchanged page)."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, result FROM frontier WHERE status = 'done'").fetchall()
+        return {url: json.loads(result) for url, result in rows}
+
+    def completed_links(self) -> dict:
+        """Links found on the URLs already finished, for resuming a link-following crawl."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, links FROM frontier WHERE status = 'done'").fetchall()
+        return {url: json.loads(links) if links else [] for url, links in rows}
+
+    def mark_done(self, url: str, result: list[dict] | None, links: list[str] | None = None, failed: bool = False):
+        """
+        Records a URL's result (and the links found on it). Failed pages are
+        retried on resume; pages that yielded no items without failing (e.g.
+        near-duplicates of a page already extracted) count as done.
+        """
+        status = "failed" if failed else "done"
+        with self._lock:
+            self._db.execute(
+                "UPDATE frontier SET status = ?, result = ?, links = ? WHERE url = ?",
+                (status, json.dumps(result), json.dumps(links) if links else None, url),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def remove_checkpoint(path: str):
+    """Deletes a checkpoint database and its WAL side files, if they exist."""
+    for file_path in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,158 @@
+"""
+Main-content isolation and token-budgeted windowing for LLM extraction.
+"""
+
+import re
+from typing import Callable, List, Tuple
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+# Elements that never hold the page's main content
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "form",
+                    "nav", "header", "footer", "aside"]
+BOILERPLATE_ROLES = ["navigation", "banner", "contentinfo", "complementary", "search"]
+# A <header> inside these introduces the content (title, byline), not the site
+CONTENT_SECTIONS = ["article", "main"]
+
+CHARS_PER_TOKEN = 4  # Rough average for English prose with gpt-4o-mini's tokenizer
+MAIN_CONTENT_SHARE = 0.7  # The main block must hold this share of the page's non-link text
+LEAD_MAX_CHARS = 300  # Title, byline and date just before the main block fit in this many characters
+
+def strip_boilerplate(soup: BeautifulSoup):
+    """
+    Removes navigation, site headers/footers, asides, scripts and similar elements
+    in place. Headers of an article or main section hold its title and stay.
+    """
+    for tag in soup.find_all(BOILERPLATE_TAGS):
+        if tag.name == "header" and tag.find_parent(CONTENT_SECTIONS):
+            continue
+        tag.decompose()
+    for tag in soup.find_all(attrs={"role": BOILERPLATE_ROLES}):
+        tag.decompose()
+
+def densest_block(root, children: Callable, own_text_length: Callable, is_link: Callable):
+    """
+    Returns the deepest element that still holds most of the non-link text under
+    `root`: the article body on a post, the list container on an index page.
+    Works on any tree given how to list an element's child elements, measure its
+    own (direct) text and recognise links. Lengths are computed in one iterative
+    post-order pass.
+    """
+    kids = {}
+    text_len = {}
+    link_len = {}
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited:
+            kids[id(node)] = children(node)
+            stack.append((node, True))
+            stack.extend((child, False) for child in kids[id(node)])
+            continue
+        node_kids = kids[id(node)]
+        total = own_text_length(node) + sum(text_len[id(c)] for c in node_kids)
+        text_len[id(node)] = total
+        link_len[id(node)] = total if is_link(node) else sum(link_len[id(c)] for c in node_kids)
+
+    target = (text_len[id(root)] - link_len[id(root)]) * MAIN_CONTENT_SHARE
+    best = root
+    while target > 0:
+        child = next((c for c in kids[id(best)] if text_len[id(c)] - link_len[id(c)] >= target), None)
+        if child is None:
+            break
+        best = child
+    return best
+
+def lead_lines(block, root, parent: Callable, preceding_siblings: Callable,
+               text_and_link_length: Callable[..., Tuple[str, int]]) -> List[str]:
+    """
+    Text just before the main block that belongs to it: the title, byline and date
+    that sit next to an article body rather than inside it. Walks up from `block`
+    to `root` through the preceding siblings, nearest first, and stops at the first
+    one that is mostly links (navigation, related posts) or would take the lead
+    past LEAD_MAX_CHARS. Returned in document order.
+    """
+    lines = []
+    size = 0
+    node = block
+    while node is not root and node is not None:
+        for sibling in preceding_siblings(node):
+            text, link_length = text_and_link_length(sibling)
+            if not text:
+                continue
+            if link_length * 2 >= len(text) or size + len(text) > LEAD_MAX_CHARS:
+                return lines
+            lines.insert(0, text)
+            size += len(text)
+        node = parent(node)
+    return lines
+
+def _soup_children(node: Tag) -> list:
+    return [child for child in node.children if isinstance(child, Tag)]
+
+def _soup_own_text_length(node: Tag) -> int:
+    return sum(len(child.strip()) for child in node.children
+               if isinstance(child, NavigableString) and not isinstance(child, Comment))
+
+def _soup_text_and_link_length(node: Tag) -> Tuple[str, int]:
+    text = node.get_text(separator="\n", strip=True)
+    links = [node] if node.name == "a" else node.find_all("a")
+    return text, sum(len(link.get_text(strip=True)) for link in links)
+
+def main_content_text(soup: BeautifulSoup) -> str:
+    """
+    Main-content text of a parsed page, one block per line, led by the title and
+    byline found just before it. Strips the tree in place.
+    """
+    strip_boilerplate(soup)
+    root = soup.body or soup
+    block = densest_block(root, _soup_children, _soup_own_text_length, lambda node: node.name == "a")
+    lead = lead_lines(block, root, lambda node: node.parent, lambda node: node.find_previous_siblings(True),
+                      _soup_text_and_link_length)
+    return normalize_lines("\n".join(lead + [block.get_text(separator="\n", strip=True)]))
+
+def normalize_lines(text: str) -> str:
+    return re.sub(r"\n{2,}", "\n", text)
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_into_windows(text: str, window_tokens: int = 2500, overlap_tokens: int = 150,
+                       max_windows: int = 4) -> List[str]:
+    """
+    Splits text into windows of about `window_tokens`, breaking on line boundaries
+    and repeating the last `overlap_tokens` of each window at the start of the next.
+    At most `max_windows` are returned, which caps the per-page token cost.
+    """
+    window_chars = window_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    if len(text) <= window_chars:
+        return [text] if text else []
+
+    # Hard-wrap single lines that would not fit in a window on their own
+    lines = []
+    for line in text.split("\n"):
+        while len(line) > window_chars:
+            lines.append(line[:window_chars])
+            line = line[window_chars:]
+        lines.append(line)
+
+    windows = []
+    current, size = [], 0
+    for line in lines:
+        if current and size + len(line) + 1 > window_chars:
+            windows.append("\n".join(current))
+            if len(windows) == max_windows:
+                return windows
+            # Carry the tail of this window over as overlap
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                if overlap_size + len(previous) > overlap_chars:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += len(previous) + 1
+            current, size = overlap, overlap_size
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        windows.append("\n".join(current))
+    return windows[:max_windows]
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+def _parse_lastmod(value: str | None) -> datetime | None:
+    """Parses a sitemap <lastmod> (W3C datetime) into an aware datetime."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+class CrawlState:
+    """
+    Per-URL validators remembered between crawls: sitemap lastmod, ETag,
+    Last-Modified and a hash of the fetched content. Used by incremental
+    crawls to skip or conditionally fetch pages that have not changed.
+    Link-following crawls also keep each page's links, so an unchanged (304)
+    page can still be expanded.
+    """
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.urls = self._load()
+
+    def _load(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read crawl state {self.path}, starting fresh: {e}")
+            return {}
+
+    def save(self):
+        """Writes the state atomically."""
+        with self._lock:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.urls, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def is_unchanged(self, url: str, lastmod: str | None) -> bool:
+        """True when the sitemap lastmod has not advanced since the last crawl of `url`."""
+        with self._lock:
+            entry = self.urls.get(url)
+        if not entry or not lastmod or not entry.get("lastmod"):
+            return False
+        new, old = _parse_lastmod(lastmod), _parse_lastmod(entry["lastmod"])
+        if new and old:
+            return new <= old
+        return lastmod == entry["lastmod"]
+
+    def validators(self, url: str) -> dict:
+        """The stored ETag, Last-Modified and content hash for `url`."""
+        with self._lock:
+            entry = self.urls.get(url, {})
+        return {key: entry[key] for key in ("etag", "last_modified", "content_hash") if entry.get(key)}
+
+    def links(self, url: str) -> list[str] | None:
+        """Links found on `url` when it was last fetched (kept for link-following crawls)."""
+        with self._lock:
+            return self.urls.get(url, {}).get("links")
+
+    def update(self, url: str, lastmod: str | None = None, **validators):
+        """Records new validators for `url`, keeping any that were not supplied."""
+        with self._lock:
+            entry = self.urls.setdefault(url, {})
+            if lastmod:
+                entry["lastmod"] = lastmod
+            entry.update({key: value for key, value in validators.items() if value})
@@ -1,170 +1,584 @@
+import json
+import os
 import requests
-from bs4 import BeautifulSoup
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
 from urllib.parse import urljoin, urlparse
-from .agent_scraper import KadoaInspiredScraper
+from .agent_scraper import KadoaInspiredScraper, MAX_EXTRACTION_ATTEMPTS, MAX_STRATEGY_ATTEMPTS
+from .crawl_state import CrawlState
+from .ndjson_output import NDJSONItemWriter
+from .page_archive import PageArchive
+from .checkpoint import CrawlCheckpoint
+from .batch_extractor import BatchExtractor
+from .sitemap import iter_sitemap
+from .frontier import Frontier, canonicalize_url, clean_url
+from .near_dup import deduplicate_near
+from .pipeline import Stage
+from .scrape_result import failure_of, is_retryable_extraction
 import logging
 
 logger = logging.getLogger(__name__)
 
 def _deduplicate_items(items: list[dict]) -> list[dict]:
     """
-    Deduplicates a list of scraped items based on their title.
-    If multiple items have the same title, it keeps the one with the longest content.
+    Deduplicates a list of scraped items by content similarity (SimHash), so
+    syndicated copies and near-identical pages collapse even under different
+    titles, while different posts sharing a title are kept apart. Items with too
+    little content to compare (teasers, "Read more") only collapse when their
+    title and content are the same.
+    Of each group of near-duplicates, the item with the longest content is kept.
     """
-    unique_items = {}
-    for item in items:
-        title = item.get("title")
-        if not title:
-            continue
-
-        if title not in unique_items or len(item.get("content", "")) > len(unique_items[title].get("content", "")):
-            unique_items[title] = item
-    
-    return list(unique_items.values())
+    return deduplicate_near(items)
 
 class Crawler:
     """
     Crawls a website by finding its sitemap and scraping all the URLs found.
+    Sitemap URLs are scraped as they are discovered, while the rest of the
+    sitemap (and its child sitemaps) is still being fetched.
+
+    URLs flow through a fetch -> parse -> extract pipeline (see _scrape_urls), so
+    pages are downloaded while others wait on the LLM. `workers` sizes every stage
+    by default; `fetch_workers`, `parse_workers` and `extract_workers` size them
+    separately, depending on whether the site's rate limit or OpenAI's is the
+    bottleneck, and `queue_size` bounds how many pages wait between stages.
+    At most `per_host_limit` fetches run against the same host at once, so more
+    fetch workers speed up the crawl without hammering a single site. Requests to
+    each host are also paced to `requests_per_second`, or slower if robots.txt
+    sets a Crawl-delay.
+
+    Without a sitemap the site is crawled breadth-first from the base URL: links
+    of each scraped page are followed up to `max_depth` levels deep, for at most
+    `max_pages` pages, within the base URL's path scope (see Frontier).
+
+    When `state_path` is given the crawl is incremental: per-URL validators are
+    kept in that file, pages whose sitemap lastmod has not advanced are skipped,
+    and the rest are fetched conditionally (ETag / Last-Modified). The file is
+    only written by save_state(), once the crawl's output is safely on disk.
+
+    With an `archive_path`, the raw HTML of every fetched page is appended to a
+    PageArchive there, so extraction can later be replayed without the network.
     """
-    def __init__(self):
-        self.scraper = KadoaInspiredScraper()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, workers: int = 1, per_host_limit: int = 4, state_path: str | None = None,
+                 requests_per_second: float = 2.0, max_depth: int = 3, max_pages: int = 500,
+                 fetch_workers: int | None = None, parse_workers: int | None = None,
+                 extract_workers: int | None = None, queue_size: int | None = None,
+                 archive_path: str | None = None):
+        self.workers = max(1, workers)
+        self.fetch_workers = max(1, fetch_workers or self.workers)
+        # Parsing is CPU bound: more threads than cores only contend for the GIL
+        self.parse_workers = max(1, parse_workers or min(self.workers, os.cpu_count() or 1))
+        self.extract_workers = max(1, extract_workers or self.workers)
+        self.queue_size = queue_size  # Pages waiting in front of each stage (None = twice its workers)
+        self.archive = PageArchive(archive_path) if archive_path else None
+        self.scraper = KadoaInspiredScraper(
+            browser_pool_size=min(self.fetch_workers, 4),
+            http_pool_size=max(10, self.fetch_workers),
+            requests_per_second=requests_per_second,
+            archive=self.archive,
+        )
+        self.state = CrawlState(state_path) if state_path else None
+        self.per_host_limit = max(1, per_host_limit)
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.per_host_limit))
+        self._host_slots_lock = threading.Lock()
+        # robots.txt, sitemaps and link extraction share the scraper's connection pool
+        self.http = self.scraper.http
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.frontier = None  # Set while a link-following (no sitemap) crawl runs
 
     def _find_sitemap_url(self, base_url: str) -> str | None:
-        """Finds the sitemap URL from the robots.txt file."""
+        """
+        Finds the sitemap URL from the robots.txt file.
+        A Crawl-delay in the `User-agent: *` group is passed on to the rate limiter.
+        """
         robots_url = urljoin(base_url, "/robots.txt")
+        sitemap_url = None
         try:
-            response = self.session.get(robots_url, timeout=10)
+            response = self.http.get(robots_url, timeout=10)
             response.raise_for_status()
+            group_agents = []
+            in_rules = False
             for line in response.text.splitlines():
-                if line.lower().startswith("sitemap:"):
-                    return line.split(":", 1)[1].strip()
+                key, _, value = line.split("#", 1)[0].partition(":")
+                key, value = key.strip().lower(), value.strip()
+                if key == "sitemap" and sitemap_url is None:
+                    sitemap_url = value
+                elif key == "user-agent":
+                    # Consecutive User-agent lines share one group of rules
+                    if in_rules:
+                        group_agents, in_rules = [], False
+                    group_agents.append(value)
+                elif key:
+                    # Any other directive, Crawl-delay included, ends the group's list of agents
+                    in_rules = True
+                    if key == "crawl-delay" and "*" in group_agents:
+                        try:
+                            self.scraper.rate_limiter.set_crawl_delay(urlparse(base_url).netloc, float(value))
+                        except ValueError:
+                            logger.warning(f"Ignoring invalid Crawl-delay in {robots_url}: {value}")
         except requests.RequestException as e:
             logger.warning(f"Could not fetch or parse robots.txt at {robots_url}: {e}")
-        return None
+        return sitemap_url
 
-    def _get_urls_from_sitemap(self, sitemap_url: str) -> list[str]:
-        """Parses a sitemap (including sitemap indexes) and returns a list of page URLs."""
-        urls = []
-        try:
-            response = self.session.get(sitemap_url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "xml")
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Returns the semaphore that caps concurrent requests to the URL's host."""
+        with self._host_slots_lock:
+            return self._host_slots[urlparse(url).netloc]
+
+    def _scrape_urls(self, urls: Iterable[str], lastmods: dict | None = None, sink: NDJSONItemWriter | None = None,
+                     checkpoint: CrawlCheckpoint | None = None, total: int | None = None) -> dict[str, list[dict] | None]:
+        """
+        Scrapes every URL through a three-stage pipeline and returns {url: result}:
+
+        - fetch: choose a strategy and download the page (network bound, per-host limited)
+        - parse: parse the HTML, check validators and try local extraction (CPU bound)
+        - extract: LLM extraction of the pages that still need it (OpenAI bound)
+
+        Each stage has its own worker count and a bounded queue in front of it, so
+        fetching runs ahead of extraction only as far as the queues allow. `urls` may
+        be a generator that is still discovering URLs: each one enters the pipeline
+        as soon as it arrives. A failed fetch sends the URL back to the fetch stage
+        with the next strategy, like scrape_with_ai_orchestration; a failed extraction
+        goes back to the extract stage with the parsed page, never to the fetch stage.
+
+        With a `sink`, items are written out as soon as each URL is done and only
+        their `source_url` is kept in the returned results. With a `checkpoint`,
+        each URL's result is recorded as soon as it finishes.
+        """
+        lastmods = lastmods if lastmods is not None else {}
+        results = {}
+        outstanding = 0  # URLs that entered the pipeline and are not finished
+        idle = threading.Condition()
 
-            if soup.find('sitemapindex'):
-                # This is a sitemap index file, recursively parse the sitemaps it points to
-                for loc in soup.select("sitemap > loc"):
-                    urls.extend(self._get_urls_from_sitemap(loc.text))
+        def finish(job: dict, result: dict):
+            nonlocal outstanding
+            if job["finished"]:
+                return
+            job["finished"] = True
+            job.pop("fetched", None)
+            job.pop("prepared", None)
+            links = job.get("links")
+            try:
+                items, links = self._finish_url(job, result)
+                failed = failure_of(result) is not None
+                results[job["url"]] = self._record_result(job["url"], items, sink, checkpoint, links, failed)
+            finally:
+                self._links_known(job, links)  # For an unchanged page: the links saved by the previous crawl
+                with idle:
+                    outstanding -= 1
+                    idle.notify_all()
+
+        def attempt_done(job: dict, result: dict | None):
+            """Learns from the strategy attempt; failed fetches go back to the fetch stage while strategies remain"""
+            if self.scraper.record_attempt(job["url"], job["strategy"], result, job["latency"], job["attempts"]):
+                finish(job, result)
+            elif len(job["attempts"]) < MAX_STRATEGY_ATTEMPTS:
+                fetch_stage.put(job, wait=False)  # Never block: the fetch stage may be waiting on us
             else:
-                # This is a regular sitemap
-                urls = [loc.text for loc in soup.select("url > loc")]
-        except requests.RequestException as e:
-            logger.warning(f"Could not fetch or parse sitemap {sitemap_url}: {e}")
-        return urls
-
-    def _get_links_from_page(self, html_content: str, base_url: str, path_prefix: str | None = None) -> list[str]:
-        """Extracts internal links, optionally filtering by a path prefix."""
-        soup = BeautifulSoup(html_content, "html.parser")
-        links = set()
-        base_domain = urlparse(base_url).netloc
-        
-        for a_tag in soup.find_all("a", href=True):
-            href = a_tag['href']
-            # Join relative URLs with the base URL
-            full_url = urljoin(base_url, href)
-            parsed_full_url = urlparse(full_url)
-            
-            # Check if the link is on the same domain
-            if parsed_full_url.netloc == base_domain:
-                # If a path_prefix is specified, check if the link's path starts with it
-                if path_prefix:
-                    if parsed_full_url.path.startswith(path_prefix):
-                        links.add(full_url)
+                finish(job, self.scraper.failed_result())
+
+        def guarded(handler):
+            def run(job: dict):
+                try:
+                    handler(job)
+                except Exception as e:
+                    logger.error(f"Failed to scrape {job['url']}: {e}")
+                    finish(job, {})
+            return run
+
+        @guarded
+        def fetch(job: dict):
+            url = job["url"]
+            if not job["attempts"]:
+                logger.info(f"({job['position']}/{total or '?'}) Scraping URL: {url}")
+            job["strategy"] = self.scraper.choose_strategy(url, job["attempts"])
+            with self._host_slot(url):
+                started = time.perf_counter()
+                fetched = self.scraper.fetch_page(url, job["strategy"], job["validators"])
+                job["latency"] = time.perf_counter() - started
+            if "html" not in fetched:
+                attempt_done(job, fetched)  # Fetch failed, or nothing left to extract (304, surgical links)
+                return
+            job["fetched"] = fetched
+            parse_stage.put(job)  # Dropped if the crawl is being cancelled
+
+        @guarded
+        def parse(job: dict):
+            fetched = job.pop("fetched")
+            prepared = self.scraper.prepare_page(fetched["html"], job["url"], job["validators"], fetched["headers"])
+            job["links"] = prepared["links"]
+            self._links_known(job, prepared["links"])  # The frontier can grow before the LLM call
+            if "result" in prepared:
+                attempt_done(job, prepared["result"])
+                return
+            job["prepared"] = prepared
+            job["extractions"] = 0
+            extract_stage.put(job)
+
+        @guarded
+        def extract(job: dict):
+            job["extractions"] += 1
+            last = job["extractions"] >= MAX_EXTRACTION_ATTEMPTS
+            result = self.scraper.extract_prepared(job["prepared"], job["url"], allow_partial=last)
+            if is_retryable_extraction(result) and not last:
+                logger.warning(f"Extraction attempt {job['extractions']} failed for {job['url']}, retrying on the fetched page")
+                extract_stage.put(job, wait=False)  # The page stays in memory; only the extraction is repeated
+                return
+            job.pop("prepared")
+            attempt_done(job, result)
+
+        fetch_stage = Stage("fetch", fetch, self.fetch_workers, self.queue_size)
+        parse_stage = Stage("parse", parse, self.parse_workers, self.queue_size)
+        extract_stage = Stage("extract", extract, self.extract_workers, self.queue_size)
+        stages = [fetch_stage, parse_stage, extract_stage]
+        logger.info(f"Scraping with {self.fetch_workers} fetch, {self.parse_workers} parse and "
+                    f"{self.extract_workers} extract workers ({self.per_host_limit} fetches per host).")
+        for stage in stages:
+            stage.start()
+        try:
+            for position, url in enumerate(urls, 1):
+                job = {
+                    "url": url, "position": position, "lastmod": lastmods.get(url),
+                    "validators": self.state.validators(url) if self.state else None,
+                    "attempts": [], "links": None, "frontier_done": False, "finished": False,
+                }
+                with idle:
+                    outstanding += 1
+                fetch_stage.put(job)  # Blocks while the fetch queue is full
+            with idle:
+                idle.wait_for(lambda: outstanding == 0)
+            return results
+        except BaseException:
+            # On Ctrl-C, drop queued URLs and let in-flight ones finish (and be checkpointed)
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            for stage in stages:
+                stage.close()
+
+    def _links_known(self, job: dict, links: list[str] | None):
+        """Reports a URL's links to a link-following frontier, once per URL."""
+        if self.frontier is not None and not job["frontier_done"]:
+            job["frontier_done"] = True
+            self.frontier.complete(job["url"], links)
+
+    def _finish_url(self, job: dict, result: dict) -> tuple[list[dict] | None, list[str] | None]:
+        """
+        Turns a URL's final result into (items, links) and updates its incremental
+        state. Items are None when the URL failed or an incremental crawl finds the
+        page unchanged, so the items of the previous crawl are kept for it.
+        """
+        url = job["url"]
+        links = result.get("links", job.get("links"))
+        self.scraper.metrics.increment(f"urls_{result.get('status') or ('scraped' if result.get('items') else 'empty')}")
+        if self.state and "fetch_meta" in result:
+            # Link-following crawls keep links, so an unchanged page can still be expanded
+            kept_links = links if self.frontier is not None else None
+            self.state.update(url, job["lastmod"], links=kept_links, **result["fetch_meta"])
+            if links is None and self.frontier is not None:
+                links = self.state.links(url)
+        if result.get("status") == "not_modified" or failure_of(result) is not None:
+            return None, links
+        if result.get("items"):
+            logger.info(f"Successfully scraped {len(result['items'])} items from {url}")
+            return result["items"], links
+        return [], links
+
+    def _record_result(self, url: str, result: list[dict] | None, sink: NDJSONItemWriter | None,
+                       checkpoint: CrawlCheckpoint | None, links: list[str] | None = None,
+                       failed: bool = False) -> list[dict] | None:
+        """Streams a finished URL's items to the sink and checkpoints it (failed URLs are retried on resume)."""
+        if sink is not None and result is not None:
+            sink.write(result)
+            # The content is on disk now; keep only what the merge step needs
+            result = [{"source_url": item.get("source_url")} for item in result]
+        if checkpoint is not None:
+            checkpoint.mark_done(url, result, links if self.frontier is not None else None, failed=failed)
+        return result
+
+    def _scrape_urls_batch(self, urls: Iterable[str], sink: NDJSONItemWriter | None = None,
+                           checkpoint: CrawlCheckpoint | None = None) -> dict[str, list[dict]]:
+        """
+        Batch mode: fetches every page first (no strategy LLM calls), then extracts
+        them all in OpenAI Batch API jobs. Returns {url: result}.
+        """
+        extractor = BatchExtractor(self.scraper.client, cache=self.scraper.cache, metrics=self.scraper.metrics)
+        custom_ids = {}  # url -> one custom_id per content window
+        local_results = {}  # Pages extracted deterministically never enter the batch
+        fingerprints = {}  # url -> page fingerprint, for near-duplicate detection once every page is fetched
+        page_links = {}
+        failed_urls = set()
+
+        def fetch(url: str, position: int) -> bool:
+            page = None
+            try:
+                with self._host_slot(url):
+                    html = self.scraper.fetch_html(url)
+                if html is None:
+                    logger.error(f"Could not fetch {url}")
+                    failed_urls.add(url)
+                    return False
+                page = self.scraper.parse(html)
+                page_links[url] = page.links()
+                # Local extraction first, as in prepare_page: it reuses the parsed tree that main_text() strips
+                local = self.scraper.local_extract(page, url)
+                if local is not None:
+                    local_results[url] = local["items"]
                 else:
-                    # If no prefix (i.e., we started from the root), add all internal links
-                    links.add(full_url)
-        return list(links)
+                    window_requests = self.scraper.build_extraction_requests(page, url)
+                    custom_ids[url] = [f"page-{position}-w{j}" for j in range(len(window_requests))]
+                    for custom_id, request in zip(custom_ids[url], window_requests):
+                        extractor.add(custom_id, request)
+                with self.scraper.metrics.timer("dedup", url):
+                    fingerprints[url] = self.scraper.page_fingerprint(page)
+                return True
+            finally:
+                if self.frontier is not None:
+                    self.frontier.complete(url, page_links.get(url))
 
-    def crawl(self, base_url: str) -> dict:
+        # Fetching starts while `urls` is still being discovered
+        fetched_urls = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for position, url in enumerate(urls):
+                fetched_urls.append(url)
+                futures.append(executor.submit(fetch, url, position))
+            fetched = sum(future.result() for future in futures)
+        urls = fetched_urls
+        self._skip_near_duplicates(fingerprints, local_results, custom_ids, extractor)
+        logger.info(f"Fetched {fetched}/{len(urls)} pages. Submitting extraction batch...")
+        answers = extractor.run()
+
+        results = {}
+        for url in urls:
+            items = local_results.get(url, [])
+            windows = []
+            for custom_id in custom_ids.get(url, []):
+                content = answers.get(custom_id)
+                if content is None:
+                    continue
+                try:
+                    windows.append(self.scraper.parse_extraction(content, url))
+                    extractor.remember(custom_id)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Batch extraction for {url} returned invalid JSON: {e}")
+            if windows:
+                items = self.scraper.merge_extractions(windows).get("items", [])
+            elif custom_ids.get(url):
+                # No usable answer for any window (partial answers are kept, as on a last extraction attempt)
+                logger.error(f"Batch extraction failed for {url}")
+                failed_urls.add(url)
+            failed = url in failed_urls
+            results[url] = self._record_result(url, None if failed else items, sink, checkpoint,
+                                               page_links.get(url), failed)
+        return results
+
+    def _skip_near_duplicates(self, fingerprints: dict, local_results: dict, custom_ids: dict,
+                              extractor: BatchExtractor):
         """
-        Orchestrates the crawl: finds sitemap, gets URLs, and scrapes each one.
-        If no sitemap is found, it falls back to scraping links found on the base URL.
+        Drops the batch requests of pages that nearly duplicate another fetched page.
+        Decided once every page is fetched, in URL order, so the same copy is kept on
+        every run whatever order the fetch workers finished in. Locally extracted
+        pages cost nothing and always count as originals.
+        """
+        for url in sorted(local_results):
+            self.scraper.fingerprint_duplicate_of(fingerprints.get(url), url, remember=True)
+        for url in sorted(custom_ids):
+            original = self.scraper.fingerprint_duplicate_of(fingerprints.get(url), url, remember=True)
+            if original:
+                logger.info(f"Near-duplicate of {original}, not extracting: {url}")
+                for custom_id in custom_ids.pop(url):
+                    extractor.discard(custom_id)
+
+    def _discover_urls(self, base_url: str, known_links: dict | None = None) -> tuple[Iterable[tuple[str, str | None]], str | None]:
+        """
+        Finds the URLs to scrape from the sitemap, or by following links from the
+        base URL. Returns ((url, lastmod) entries, error status or None). Sitemap
+        entries are streamed while child sitemaps are still being fetched; followed
+        links arrive as the pages they are on get scraped. `known_links` are the
+        links of pages finished before a resume.
         """
-        logger.info(f"Starting crawl for {base_url}")
-        all_urls = []
-        
         sitemap_url = self._find_sitemap_url(base_url)
         if sitemap_url:
             logger.info(f"Found sitemap: {sitemap_url}")
-            all_urls = self._get_urls_from_sitemap(sitemap_url)
-            logger.info(f"Found {len(all_urls)} URLs in sitemap to scrape.")
+            return iter_sitemap(self.http, sitemap_url, max_workers=min(self.workers, 8)), None
+
+        logger.warning(f"No sitemap found for {base_url}. Falling back to following links from the base URL.")
+        # --- Intelligent Path Scoping ---
+        # Infer the scope from the initial URL to only crawl relevant links.
+        parsed_base_url = urlparse(base_url)
+        path_parts = parsed_base_url.path.strip('/').split('/')
+        
+        # If the path has segments (e.g., /blog/...), use the first segment as the scope.
+        # Otherwise, we are at the root, so we don't apply a path prefix filter.
+        allowed_prefix = f"/{path_parts[0]}/" if path_parts and path_parts[0] else None
+        
+        if allowed_prefix:
+            logger.info(f"Crawling is scoped to paths starting with: {allowed_prefix}")
+        logger.info(f"Following links up to {self.max_depth} levels deep, at most {self.max_pages} pages.")
+
+        self.frontier = Frontier(base_url, path_prefix=allowed_prefix, max_depth=self.max_depth,
+                                 max_pages=self.max_pages, known_links=known_links)
+        return ((url, None) for url in self.frontier), None
+
+    def _stream_frontier(self, entries: Iterable[tuple[str, str | None]], base_url: str, lastmods: dict,
+                         done: dict, discovered: list[str], checkpoint: CrawlCheckpoint | None = None) -> Iterator[str]:
+        """
+        Filters discovered (url, lastmod) entries down to the URLs to scrape, as they
+        arrive: duplicates (after dropping fragments and tracking parameters, and
+        ignoring case and trailing slashes), other domains and (incremental crawls)
+        pages whose lastmod has not advanced are not scraped. Every same-domain URL is appended to
+        `discovered`; those to scrape are also added to the checkpoint frontier.
+        URLs already in `done` are not yielded.
+        """
+        base_domain = urlparse(base_url).netloc.lower()
+        seen = set()
+        duplicates = unchanged = 0
+        for url, lastmod in entries:
+            url = clean_url(url)
+            key = canonicalize_url(url)
+            if key in seen:
+                duplicates += 1
+                self._skip(url)
+                continue
+            seen.add(key)
+            if urlparse(url).netloc.lower() != base_domain:
+                logger.info(f"Skipping URL from different domain: {url}")
+                self._skip(url)
+                continue
+            discovered.append(url)
+            if url in done:
+                continue
+            if self.state and self.state.is_unchanged(url, lastmod):
+                unchanged += 1
+                self._skip(url)
+                continue
+            if lastmod:
+                lastmods[url] = lastmod
+            if checkpoint is not None:
+                checkpoint.add(url, lastmod)
+            yield url
+
+        if duplicates:
+            logger.info(f"Removed {duplicates} duplicate URLs.")
+        if unchanged:
+            logger.info(f"Skipping {unchanged} URLs whose sitemap lastmod has not advanced.")
+        logger.info(f"Discovery finished: {len(discovered)} URLs found.")
+        if checkpoint is not None:
+            checkpoint.finish_discovery()
+
+    def save_state(self):
+        """
+        Persists the incremental state of a finished crawl. Call it once the output is
+        written: after a crash the next run must not see the pages it lost as unchanged.
+        """
+        if self.state:
+            self.state.save()
+
+    def _skip(self, url: str):
+        """Tells a link-following frontier that a URL it handed out will not be scraped."""
+        if self.frontier is not None:
+            self.frontier.complete(url, None)
+
+    def crawl(self, base_url: str, previous_items: list[dict] | None = None,
+              sink: NDJSONItemWriter | None = None, checkpoint: CrawlCheckpoint | None = None,
+              resume: bool = False, batch: bool = False) -> dict:
+        """
+        Orchestrates the crawl: finds sitemap, gets URLs, and scrapes each one.
+        If no sitemap is found, it crawls breadth-first by following links from the base URL.
+
+        `previous_items` (the items of an earlier crawl's output) are merged into the
+        result: they are kept unless the page they came from was scraped again.
+
+        With a `sink`, items are streamed to it instead of being returned; the
+        result then has an empty "items" list and an "items_written" count.
+
+        With a `checkpoint`, the frontier and every finished URL are persisted as the
+        crawl goes. `resume=True` continues the checkpointed crawl of the same base URL
+        instead of starting over.
+
+        `batch=True` extracts all pages in OpenAI Batch API jobs instead of one call
+        per page: slower to finish, but cheaper and free of per-minute rate limits.
+        Incremental validators are not refreshed in this mode.
+        """
+        logger.info(f"Starting crawl for {base_url}")
+        done = {}
+        total = None
+        resuming = checkpoint is not None and resume and checkpoint.has_frontier(base_url)
+        if resuming:
+            done = checkpoint.completed()
+        if resuming and checkpoint.discovery_complete():
+            discovered, lastmods = checkpoint.frontier()
+            logger.info(f"Resuming crawl: {len(done)} of {len(discovered)} URLs already done.")
+            pending = [url for url in discovered if url not in done]
+            total = len(pending)
         else:
-            logger.warning(f"No sitemap found for {base_url}. Falling back to page link extraction.")
-            # Fallback: scrape the base_url and get links from it
-            try:
-                response = self.session.get(base_url, timeout=10)
-                response.raise_for_status()
-                
-                # --- Intelligent Path Scoping ---
-                # Infer the scope from the initial URL to only crawl relevant links.
-                parsed_base_url = urlparse(base_url)
-                path_parts = parsed_base_url.path.strip('/').split('/')
-                
-                # If the path has segments (e.g., /blog/...), use the first segment as the scope.
-                # Otherwise, we are at the root, so we don't apply a path prefix filter.
-                allowed_prefix = f"/{path_parts[0]}/" if path_parts and path_parts[0] else None
-                
-                if allowed_prefix:
-                    logger.info(f"Crawling is scoped to paths starting with: {allowed_prefix}")
-
-                all_urls = self._get_links_from_page(response.text, base_url, path_prefix=allowed_prefix)
-                # Also include the base_url itself in the list to be scraped
-                if base_url not in all_urls:
-                    all_urls.insert(0, base_url)
-                logger.info(f"Found {len(all_urls)} links on the page to scrape.")
-            except requests.RequestException as e:
-                logger.error(f"Could not fetch the base URL for link extraction: {e}")
-                return {"team_id": self.scraper.team_id, "items": [], "status": "fallback_failed"}
-
-        if not all_urls:
+            if done:
+                logger.info(f"Resuming crawl: {len(done)} URLs already done, discovering the rest.")
+            elif checkpoint is not None:
+                checkpoint.start(base_url)
+            entries, error_status = self._discover_urls(base_url, checkpoint.completed_links() if done else None)
+            if error_status:
+                return {"team_id": self.scraper.team_id, "items": [], "status": error_status}
+            discovered, lastmods = [], {}
+            # Scraping starts on the first discovered URL, while discovery continues
+            pending = self._stream_frontier(entries, base_url, lastmods, done, discovered, checkpoint)
+
+        try:
+            if batch:
+                new_results = self._scrape_urls_batch(pending, sink, checkpoint)
+            else:
+                new_results = self._scrape_urls(pending, lastmods, sink, checkpoint, total)
+        finally:
+            self.frontier = None
+            self.scraper.close()
+            if self.archive is not None:
+                self.archive.close()
+                logger.info(f"Archived {self.archive.written} pages to {self.archive.path}")
+
+        if not discovered:
             logger.error(f"No URLs found to scrape for {base_url}.")
             return {"team_id": self.scraper.team_id, "items": [], "status": "no_urls_found"}
 
-        # --- Deduplication Step ---
-        original_url_count = len(all_urls)
-        # Convert to set to remove duplicates, then back to list
-        unique_urls = list(set(all_urls))
-        deduped_url_count = len(unique_urls)
-
-        if original_url_count > deduped_url_count:
-            duplicates_removed = original_url_count - deduped_url_count
-            logger.info(f"Removed {duplicates_removed} duplicate URLs. Now scraping {deduped_url_count} unique URLs.")
-        
+        results = {**done, **new_results}
         all_items = []
-        base_domain = urlparse(base_url).netloc
-        total_urls_to_scrape = len(unique_urls)
+        refreshed_urls = set()
+        # Sorted, so deduplication sees the same input on every run whatever the discovery order
+        for url in sorted(discovered):
+            items = results.get(url)
+            if items is None:
+                continue  # Unchanged since the previous crawl, or failed this time: keep its items
+            refreshed_urls.add(url)
+            refreshed_urls.update(item.get("source_url") for item in items)
+            if sink is None:
+                all_items.extend(items)
 
-        for i, url in enumerate(unique_urls):
-            if urlparse(url).netloc != base_domain:
-                logger.info(f"Skipping URL from different domain: {url}")
-                continue
+        if previous_items:
+            kept = [item for item in previous_items if item.get("source_url") not in refreshed_urls]
+            logger.info(f"Keeping {len(kept)} items from the previous crawl.")
+            if sink is None:
+                all_items.extend(kept)
+            else:
+                sink.write(kept)
 
-            logger.info(f"({i+1}/{total_urls_to_scrape}) Scraping URL: {url}")
-            try:
-                result = self.scraper.scrape_with_ai_orchestration(url)
-                if result and result.get("items"):
-                    all_items.extend(result["items"])
-                    logger.info(f"Successfully scraped {len(result['items'])} items from {url}")
-            except Exception as e:
-                logger.error(f"Failed to scrape {url}: {e}")
+        if sink is not None:
+            logger.info(f"Crawl finished. {sink.written} items streamed to {sink.path}")
+            return {
+                "team_id": self.scraper.team_id,
+                "items": [],
+                "status": "crawl_completed",
+                "items_written": sink.written
+            }
 
         logger.info(f"Crawl finished. Total items scraped before deduplication: {len(all_items)}")
 
         # Deduplicate the final list of items
-        deduplicated_items = _deduplicate_items(all_items)
+        with self.scraper.metrics.timer("dedup"):
+            deduplicated_items = _deduplicate_items(all_items)
         logger.info(f"Deduplication complete. Final item count: {len(deduplicated_items)}")
         
         return {
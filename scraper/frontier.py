@@ -0,0 +1,124 @@
+import heapq
+import threading
+from typing import Iterator
+from urllib.parse import parse_qsl, unquote_plus, urlencode, urljoin, urlparse, urlunparse
+
+# Query parameters that only track where a visitor came from; they never change the page.
+# Plain "ref" is not one of them: sites also use it for a branch, tag or page reference.
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "ref_src", "igshid", "si", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_", "mtm_")
+
+def _is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+def clean_url(url: str) -> str:
+    """The URL without its fragment and tracking parameters: what actually gets fetched."""
+    parts = urlparse(url)
+    # The kept parameters stay byte for byte as they were: re-encoding would turn "?a" into "?a="
+    params = [param for param in parts.query.split("&")
+              if param and not _is_tracking(unquote_plus(param.split("=", 1)[0]))]
+    return urlunparse(parts._replace(query="&".join(params), fragment=""))
+
+def canonicalize_url(url: str) -> str:
+    """
+    Key under which variants of one page are deduplicated: no fragment or tracking
+    parameters, lower-case scheme and host, no default port, sorted query
+    parameters and no trailing slash (except for the root path). Paths keep their
+    case, since servers may treat it as significant.
+    """
+    parts = urlparse(clean_url(url))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, path, parts.params, query, ""))
+
+def in_path_scope(url: str, path_prefix: str | None) -> bool:
+    """True when the URL's path is under `path_prefix` ("/blog/" also matches "/blog")."""
+    if not path_prefix:
+        return True
+    path = urlparse(url).path
+    return path.startswith(path_prefix) or path == path_prefix.rstrip("/")
+
+class Frontier:
+    """
+    Breadth-first crawl frontier for sites without a sitemap.
+
+    Starting from `base_url`, links of every scraped page are added one level
+    deeper, up to `max_depth`, and at most `max_pages` URLs are ever admitted.
+    Only same-host links inside `path_prefix` are followed, and URL variants
+    (fragments, tracking parameters, case, trailing slashes) are admitted once.
+    Pending URLs are served shallowest first, then shortest path first.
+
+    Iterating yields URLs as they become available; while none are queued it waits
+    for in-flight pages to report their links through complete(), and it ends
+    when the queue is empty and nothing is in flight. `known_links` maps URLs
+    already scraped (e.g. before a resume) to their links: they are yielded and
+    expanded immediately instead of waiting for complete().
+    """
+    def __init__(self, base_url: str, path_prefix: str | None = None, max_depth: int = 3,
+                 max_pages: int = 500, known_links: dict | None = None):
+        self.host = urlparse(base_url).netloc.lower()
+        self.path_prefix = path_prefix
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.known_links = known_links or {}
+        self._heap = []
+        self._seen = set()
+        self._depth = {}
+        self._seq = 0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self._add(clean_url(base_url), 0)
+
+    def _add(self, url: str, depth: int) -> bool:
+        key = canonicalize_url(url)
+        if key in self._seen or self.admitted >= self.max_pages:
+            return False
+        self._seen.add(key)
+        self._depth[url] = depth
+        segments = len([part for part in urlparse(url).path.split("/") if part])
+        heapq.heappush(self._heap, (depth, segments, self._seq, url))
+        self._seq += 1
+        self.admitted += 1
+        return True
+
+    def _add_links(self, parent_url: str, links: list[str]):
+        depth = self._depth.get(parent_url, self.max_depth) + 1
+        if depth > self.max_depth:
+            return
+        for href in links:
+            url = clean_url(urljoin(parent_url, href))
+            parts = urlparse(url)
+            if parts.scheme not in ("http", "https") or parts.netloc.lower() != self.host:
+                continue
+            if in_path_scope(url, self.path_prefix):
+                self._add(url, depth)
+
+    def complete(self, url: str, links: list[str] | None):
+        """Reports that a yielded URL was scraped, with the links found on it."""
+        with self._cond:
+            self._add_links(url, links or [])
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            with self._cond:
+                while not self._heap and self._in_flight:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                _, _, _, url = heapq.heappop(self._heap)
+                if url in self.known_links:
+                    self._add_links(url, self.known_links[url])
+                else:
+                    self._in_flight += 1
+            yield url
@@ -0,0 +1,141 @@
+"""
+Pluggable HTML parsing: each fetched page is parsed once and the same tree serves
+link discovery, main-content text and the local extractor.
+lxml is used when installed (it already comes with trafilatura), with
+BeautifulSoup's pure-Python html.parser as the fallback.
+"""
+
+import logging
+from typing import List, Optional
+from bs4 import BeautifulSoup
+from content_windowing import (
+    BOILERPLATE_TAGS, BOILERPLATE_ROLES, CONTENT_SECTIONS, densest_block, lead_lines, main_content_text,
+    normalize_lines
+)
+
+try:
+    import lxml.html
+except ImportError:  # Optional: fall back to BeautifulSoup's html.parser
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# Same elements as strip_boilerplate(): headers only outside an article or main section
+_IN_CONTENT_SECTION = " or ".join(f"ancestor::{tag}" for tag in CONTENT_SECTIONS)
+_STRIP_XPATH = "|".join(
+    [f"//{tag}" if tag != "header" else f"//header[not({_IN_CONTENT_SECTION})]" for tag in BOILERPLATE_TAGS]
+    + [f'//*[@role="{role}"]' for role in BOILERPLATE_ROLES] + ["//comment()"]
+)
+
+class ParsedPage:
+    """
+    A parsed HTML page. Links are read before main_text() strips boilerplate from
+    the tree, so both can be asked for in any order without parsing twice.
+    """
+    backend = None
+
+    def __init__(self, html: str):
+        self.html = html
+        self._links = None
+        self._main_text = None
+
+    def links(self) -> List[str]:
+        """Raw href values of every <a href> on the page, in document order."""
+        if self._links is None:
+            self._links = self._find_links()
+        return self._links
+
+    def main_text(self) -> str:
+        """Text of the densest content block, one block per line, without boilerplate."""
+        if self._main_text is None:
+            self.links()
+            self._main_text = self._find_main_text()
+        return self._main_text
+
+    @property
+    def lxml_tree(self):
+        """The lxml tree when this backend has one, for consumers like trafilatura."""
+        return None
+
+    def _find_links(self) -> List[str]:
+        raise NotImplementedError
+
+    def _find_main_text(self) -> str:
+        raise NotImplementedError
+
+class SoupPage(ParsedPage):
+    backend = "html.parser"
+
+    def __init__(self, html: str):
+        super().__init__(html)
+        self.soup = BeautifulSoup(html, "html.parser")
+
+    def _find_links(self) -> List[str]:
+        return [a["href"] for a in self.soup.find_all("a", href=True)]
+
+    def _find_main_text(self) -> str:
+        return main_content_text(self.soup)
+
+def _lxml_children(node) -> list:
+    return [child for child in node if isinstance(child.tag, str)]
+
+def _lxml_own_text_length(node) -> int:
+    # An element's direct text is its .text plus the tails of its children
+    return len((node.text or "").strip()) + sum(len((child.tail or "").strip()) for child in node)
+
+def _lxml_text(node) -> str:
+    lines = (text.strip() for text in node.itertext())
+    return "\n".join(line for line in lines if line)
+
+def _lxml_text_and_link_length(node) -> tuple:
+    # iter() includes the node itself when it is a link
+    return _lxml_text(node), sum(len(link.text_content().strip()) for link in node.iter("a"))
+
+def _lxml_preceding_siblings(node) -> list:
+    return [sibling for sibling in node.itersiblings(preceding=True) if isinstance(sibling.tag, str)]
+
+class LxmlPage(ParsedPage):
+    backend = "lxml"
+
+    def __init__(self, html: str):
+        super().__init__(html)
+        # Encode first: lxml rejects str input that carries an XML encoding declaration
+        self.tree = lxml.html.document_fromstring(
+            html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8")
+        )
+
+    @property
+    def lxml_tree(self):
+        # Read before main_text() strips it; trafilatura copies the tree it is given
+        return self.tree if self._main_text is None else None
+
+    def _find_links(self) -> List[str]:
+        return [str(href) for href in self.tree.xpath("//a/@href")]  # Plain str: no reference back to the tree
+
+    def _find_main_text(self) -> str:
+        for element in self.tree.xpath(_STRIP_XPATH):
+            if element.getparent() is not None:  # Comments can sit outside the root element
+                element.drop_tree()  # Keeps the element's tail text
+        body = self.tree.find("body")
+        root = body if body is not None else self.tree
+        block = densest_block(root, _lxml_children, _lxml_own_text_length, lambda node: node.tag == "a")
+        lead = lead_lines(block, root, lambda node: node.getparent(), _lxml_preceding_siblings,
+                          _lxml_text_and_link_length)
+        return normalize_lines("\n".join(lead + [_lxml_text(block)]))
+
+BACKENDS = {"html.parser": SoupPage}
+if lxml is not None:
+    BACKENDS["lxml"] = LxmlPage
+
+DEFAULT_BACKEND = "lxml" if "lxml" in BACKENDS else "html.parser"
+
+def parse_html(html: str, backend: Optional[str] = None) -> ParsedPage:
+    """Parse a page with `backend` (default: the fastest one installed)."""
+    page_class = BACKENDS[backend or DEFAULT_BACKEND]
+    try:
+        return page_class(html)
+    except Exception as e:  # e.g. lxml refuses an empty document
+        if page_class is SoupPage:
+            raise
+        logger.debug(f"{page_class.backend} could not parse page, using html.parser: {e}")
+        return SoupPage(html)
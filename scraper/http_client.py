@@ -0,0 +1,83 @@
+import logging
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# urllib3 decodes brotli transparently when one of these packages is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+# 429 is not retried by urllib3: it is fed to the rate limiter so the whole host slows down
+RETRY_STATUSES = (500, 502, 503, 504)
+
+class HTTPClient:
+    """
+    One pooled, keep-alive `requests` session for every static fetch: the scraping
+    strategies, robots.txt, sitemaps and link extraction. Connections to a host are
+    reused across pages, and 5xx responses are retried with exponential backoff.
+    Every request first waits for its host's turn in the `rate_limiter`; a 429
+    pauses and slows down the host (honoring Retry-After) before the request is
+    retried, and later successful responses speed it back up.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, retries: int = 3,
+                 backoff_factor: float = 0.5, timeout: float = 15, rate_limiter: Optional[HostRateLimiter] = None):
+        self.timeout = timeout
+        self.retries = retries
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # pool_connections = number of hosts kept, pool_maxsize = keep-alive connections per host
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'User-Agent': DEFAULT_USER_AGENT,
+            'Accept-Encoding': ACCEPT_ENCODING,
+        })
+
+    def get(self, url: str, headers: Optional[Dict] = None, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """GET through the shared pool; `headers` are merged over the session defaults"""
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire(url)
+            response = self.session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            if response.status_code != 429:
+                self.rate_limiter.record_success(url)
+                return response
+            if attempt == self.retries:
+                return response
+            self.rate_limiter.penalize(url, _retry_after_seconds(response))
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Numeric Retry-After header in seconds, if the server sent one"""
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
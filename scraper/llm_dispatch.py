@@ -0,0 +1,207 @@
+"""
+Shared dispatch layer for chat completion calls.
+
+Every extraction and strategy call goes through one AsyncOpenAI client running on
+a background event loop, so the whole process shares one view of the OpenAI rate
+limits instead of each worker discovering them with its own 429s. Callers on any
+thread use the blocking complete(); the dispatcher decides when the call is sent.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+import openai
+from api_key_manager import get_openai_api_key
+from content_windowing import CHARS_PER_TOKEN
+from metrics import Metrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Failures worth retrying: the request was fine, the API could not serve it right now
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_SECONDS_PER_UNIT = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+class LLMUnavailable(Exception):
+    """A request still failed after every retry (rate limits, timeouts, server errors)"""
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset header such as "1s", "6m0s" or "250ms"."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _SECONDS_PER_UNIT[unit] for number, unit in parts)
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_request_tokens(request: Dict) -> int:
+    """Tokens a request can consume: its prompt plus the completion it may produce."""
+    chars = sum(len(message.get("content") or "") for message in request.get("messages", []))
+    return chars // CHARS_PER_TOKEN + request.get("max_tokens", 0)
+
+class LLMDispatcher:
+    """
+    Sends chat completion requests with adaptive, rate-limit-aware concurrency.
+
+    - Concurrency starts at `initial_concurrency` and grows by about one request
+      per round of successful calls, up to `max_concurrency`. It shrinks when the
+      x-ratelimit-remaining-requests / -tokens headers show the limit is close,
+      and is halved on a 429.
+    - The estimated tokens of requests in flight (prompt + max_tokens) stay within
+      `token_budget`, and within the remaining-tokens header once it is known. A
+      single request larger than the budget is still sent, alone.
+    - Rate limits, timeouts, connection and server errors are retried up to
+      `max_retries` times with jittered exponential backoff. A 429 pauses every
+      request until the reset time the API reports, not just the one that hit it.
+      When retries run out, LLMUnavailable is raised.
+
+    Each call's latency and token usage are reported to `metrics`, under the
+    stage (and URL) the caller names.
+    """
+    def __init__(self, client: Optional[openai.AsyncOpenAI] = None, max_concurrency: int = 32,
+                 initial_concurrency: int = 4, token_budget: int = 200_000, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0, timeout: float = 120.0,
+                 metrics: Optional[Metrics] = None):
+        # Retries are handled here, with the shared view of the limits, not per call by the SDK
+        self.client = client or openai.AsyncOpenAI(api_key=get_openai_api_key(), max_retries=0, timeout=timeout)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(min(initial_concurrency, self.max_concurrency))
+        self.token_budget = token_budget
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0}
+        self.metrics = metrics or get_metrics()
+        self._in_flight = 0
+        self._tokens_in_flight = 0
+        self._remaining_tokens = None  # From the last response's headers
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-dispatch", daemon=True)
+        self._thread.start()
+
+    def complete(self, request: Dict, stage: str = "llm", url: Optional[str] = None) -> str:
+        """
+        Sends one request (the kwargs of chat.completions.create) and returns the message content. Blocks the calling thread.
+        `stage` and `url` only label the call's token usage in the metrics.
+        """
+        return asyncio.run_coroutine_threadsafe(self.acomplete(request, stage, url), self._loop).result()
+
+    async def acomplete(self, request: Dict, stage: str = "llm", url: Optional[str] = None) -> str:
+        tokens = estimate_request_tokens(request)
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(tokens)
+            try:
+                self.stats["requests"] += 1
+                started = time.perf_counter()
+                raw = await self.client.chat.completions.with_raw_response.create(**request)
+                self.metrics.observe("llm_request", time.perf_counter() - started)
+                self._adapt(raw.headers, tokens)
+                completion = raw.parse()
+                self.metrics.record_tokens(stage, completion.usage, url)
+                return completion.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                error = e
+                if getattr(e, "code", None) == "insufficient_quota":
+                    break  # Waiting will not bring the quota back
+                delay = self._on_failure(e, attempt)
+            finally:
+                await self._release(tokens)
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                logger.warning(f"LLM request failed ({type(error).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        raise LLMUnavailable(f"LLM request failed after {attempt + 1} attempts: {error}") from error
+
+    def _admits(self, tokens: int) -> bool:
+        if time.monotonic() < self._paused_until:
+            return False
+        if self._in_flight == 0:
+            return True
+        if self._in_flight >= int(self.concurrency):
+            return False
+        budget = self.token_budget
+        if self._remaining_tokens is not None:
+            budget = min(budget, self._remaining_tokens)
+        return self._tokens_in_flight + tokens <= budget
+
+    async def _acquire(self, tokens: int):
+        async with self._cond:
+            while not self._admits(tokens):
+                pause = self._paused_until - time.monotonic()
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=pause if pause > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            self._in_flight += 1
+            self._tokens_in_flight += tokens
+
+    async def _release(self, tokens: int):
+        async with self._cond:
+            self._in_flight -= 1
+            self._tokens_in_flight -= tokens
+            self._cond.notify_all()
+
+    def _adapt(self, headers, tokens: int):
+        """Additive increase while the headers show headroom, gentle decrease near the limit"""
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        self._remaining_tokens = remaining_tokens
+        near_limit = (
+            (remaining_requests is not None and remaining_requests < self.concurrency)
+            or (remaining_tokens is not None and remaining_tokens < tokens * self.concurrency)
+        )
+        if near_limit:
+            self.concurrency = max(1.0, self.concurrency * 0.75)
+            if remaining_requests == 0:
+                self._pause(parse_duration(headers.get("x-ratelimit-reset-requests")))
+        else:
+            self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+
+    def _on_failure(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying; a 429 also halves concurrency and pauses everyone"""
+        cap = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = cap / 2 + random.uniform(0, cap / 2)  # Jitter keeps retries from arriving in lockstep
+        if isinstance(error, openai.RateLimitError):
+            self.stats["rate_limited"] += 1
+            self.concurrency = max(1.0, self.concurrency / 2)
+            headers = error.response.headers
+            retry_after = parse_duration(headers.get("retry-after-ms"))
+            retry_after = retry_after / 1000 if retry_after is not None else parse_duration(headers.get("retry-after"))
+            if retry_after is None:
+                resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+                retry_after = max([reset for reset in resets if reset] or [0])
+            delay = max(delay, min(retry_after, self.max_delay))
+            self._pause(delay)
+        return delay
+
+    def _pause(self, seconds: Optional[float]):
+        if seconds:
+            self._paused_until = max(self._paused_until, time.monotonic() + min(seconds, self.max_delay))
+
+_default_dispatcher = None
+_default_dispatcher_lock = threading.Lock()
+
+def get_llm_dispatcher() -> LLMDispatcher:
+    """Shared dispatcher used by the web scraper and the PDF processor"""
+    global _default_dispatcher
+    with _default_dispatcher_lock:
+        if _default_dispatcher is None:
+            _default_dispatcher = LLMDispatcher()
+        return _default_dispatcher
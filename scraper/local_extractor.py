@@ -0,0 +1,88 @@
+"""
+Deterministic extraction tier: pulls title, author and main-body markdown out of
+well-structured article pages on the CPU, without an LLM call.
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+try:
+    import trafilatura
+except ImportError:  # Optional: without it every page goes to the LLM
+    trafilatura = None
+
+logger = logging.getLogger(__name__)
+
+MIN_BODY_CHARS = 1500  # Shorter bodies are usually teasers, list pages or error pages
+
+AUTHOR_XPATHS = [
+    '//meta[@name="author"]/@content',
+    '//meta[@property="article:author"]/@content',
+    '//meta[@name="twitter:creator"]/@content',
+    '//*[@rel="author"]//text()',
+]
+
+def _first(tree, xpaths) -> Optional[str]:
+    for xpath in xpaths:
+        for value in tree.xpath(xpath):
+            value = str(value).strip()
+            if value:
+                return value
+    return None
+
+def extract_locally(html: str, url: str, tree=None) -> Tuple[Optional[Dict], float]:
+    """
+    Extract a single-article page deterministically.
+    `tree` is an already parsed lxml tree of `html`, reused instead of parsing again.
+    Returns (item, confidence); confidence is 0-1 and reflects how clearly the page
+    looks like one well-marked-up article. Callers should fall back to the LLM
+    below their threshold (list pages, thin pages, missing metadata).
+    """
+    if trafilatura is None:
+        return None, 0.0
+    try:
+        if tree is None:
+            tree = trafilatura.load_html(html)
+        if tree is None:
+            return None, 0.0
+
+        # Structural signals are read before trafilatura prunes the tree
+        articles = len(tree.xpath('//article'))
+        og_title = _first(tree, ['//meta[@property="og:title"]/@content'])
+        author = _first(tree, AUTHOR_XPATHS)
+
+        doc = trafilatura.bare_extraction(tree, url=url, include_formatting=True, with_metadata=True)
+    except Exception as e:
+        logger.debug(f"Local extraction failed for {url}: {e}")
+        return None, 0.0
+    if not doc:
+        return None, 0.0
+    if hasattr(doc, "as_dict"):
+        doc = doc.as_dict()
+
+    title = og_title or doc.get("title")
+    author = doc.get("author") or author
+    body = (doc.get("text") or "").strip()
+
+    confidence = 0.0
+    if articles == 1:
+        confidence += 0.25  # Exactly one <article>: a post, not a list of them
+    if og_title:
+        confidence += 0.2
+    if title:
+        confidence += 0.15
+    if author:
+        confidence += 0.15
+    confidence += 0.25 * min(1.0, len(body) / MIN_BODY_CHARS)
+    if articles > 1 or not title or not body:
+        confidence = min(confidence, 0.3)
+
+    item = {
+        "title": title or "",
+        "content": body,
+        "content_type": "blog",
+        "source_url": url,
+        "author": author or "Unknown",
+        "user_id": ""
+    }
+    return item, round(confidence, 2)
@@ -0,0 +1,198 @@
+"""
+Run metrics: where a crawl's (or a PDF run's) time, bytes and tokens go.
+
+The scraper, crawler, PDF processor and LLM dispatcher all report into one
+Metrics object (see get_metrics()): latency histograms per stage, bytes
+fetched, and prompt/completion tokens per LLM call, in total and per URL.
+At the end of a run it is written out as a JSON or CSV summary, or as a
+Prometheus text-format dump (e.g. for node_exporter's textfile collector).
+"""
+
+import csv
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Upper bounds in seconds of the latency buckets: Prometheus' defaults, finer around typical
+# fetch and LLM latencies and extended for slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.25, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0,
+                   2.5, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    """Bucketed latency histogram; quantiles are interpolated within a bucket"""
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last bucket holds values above every bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "max": round(self.max, 4),
+        }
+
+class Metrics:
+    """
+    Thread-safe collector for one run. Stages are free-form names; the ones used
+    here are strategy, fetch, parse, extract, dedup, llm_request, pdf_read,
+    pdf_extract and batch_extract (tokens only). Every measurement can be
+    attributed to a URL (or a PDF path).
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.stages = defaultdict(Histogram)  # stage -> latency histogram
+        self.counters = defaultdict(int)  # bytes_fetched, pages_fetched, ...
+        self.tokens = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})  # stage -> usage
+        self.urls = defaultdict(lambda: {"seconds": defaultdict(float), "bytes": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str, url: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, url)
+
+    def observe(self, stage: str, seconds: float, url: Optional[str] = None):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+            if url is not None:
+                self.urls[url]["seconds"][stage] += seconds
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def add_bytes(self, count: int, url: Optional[str] = None):
+        """One fetched page of `count` bytes"""
+        with self._lock:
+            self.counters["bytes_fetched"] += count
+            self.counters["pages_fetched"] += 1
+            if url is not None:
+                self.urls[url]["bytes"] += count
+
+    def record_tokens(self, stage: str, usage, url: Optional[str] = None):
+        """Token usage of one LLM call (a `usage` object or dict; None when the API reported none)"""
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt, completion = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+        else:
+            prompt, completion = usage.prompt_tokens or 0, usage.completion_tokens or 0
+        with self._lock:
+            totals = self.tokens[stage]
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt
+            totals["completion_tokens"] += completion
+            if url is not None:
+                self.urls[url]["prompt_tokens"] += prompt
+                self.urls[url]["completion_tokens"] += completion
+
+    def summary(self, per_url: bool = True) -> Dict:
+        with self._lock:
+            summary = {
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "stages": {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())},
+                "counters": dict(self.counters),
+                "tokens": {stage: dict(usage) for stage, usage in sorted(self.tokens.items())},
+            }
+            if per_url:
+                summary["urls"] = {
+                    url: {**entry, "seconds": {stage: round(s, 4) for stage, s in entry["seconds"].items()}}
+                    for url, entry in self.urls.items()
+                }
+        return summary
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def write_csv(self, path: str):
+        """One row per stage: latency summary plus the tokens of the LLM calls made in it"""
+        summary = self.summary(per_url=False)
+        stages = sorted(set(summary["stages"]) | set(summary["tokens"]))
+        fields = ["stage", "count", "total_seconds", "mean", "p50", "p95", "p99", "max",
+                  "calls", "prompt_tokens", "completion_tokens"]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for stage in stages:
+                writer.writerow({"stage": stage, **summary["stages"].get(stage, {}), **summary["tokens"].get(stage, {})})
+
+    def write(self, path: str):
+        """Writes the summary as CSV when `path` ends in .csv, as JSON otherwise"""
+        if path.lower().endswith(".csv"):
+            self.write_csv(path)
+        else:
+            self.write_json(path)
+
+    def to_prometheus(self, prefix: str = "scraper") -> str:
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines += [f"# HELP {prefix}_llm_tokens_total Tokens used by LLM calls.", f"# TYPE {prefix}_llm_tokens_total counter"]
+            for stage, usage in sorted(self.tokens.items()):
+                for kind in ("prompt", "completion"):
+                    lines.append(f'{prefix}_llm_tokens_total{{stage="{stage}",kind="{kind}"}} {usage[kind + "_tokens"]}')
+            lines += [f"# HELP {prefix}_llm_calls_total LLM calls that reported usage.", f"# TYPE {prefix}_llm_calls_total counter"]
+            for stage, usage in sorted(self.tokens.items()):
+                lines.append(f'{prefix}_llm_calls_total{{stage="{stage}"}} {usage["calls"]}')
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+def get_metrics() -> Metrics:
+    """Metrics shared by every component of the run"""
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+        return _default_metrics
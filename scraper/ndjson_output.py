@@ -0,0 +1,102 @@
+import json
+import os
+import textwrap
+import threading
+from typing import Iterator
+from near_dup import NearDuplicateIndex, item_fingerprint
+
+def iter_ndjson_items(path: str) -> Iterator[dict]:
+    """Yields the items of an NDJSON file one at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+class NDJSONItemWriter:
+    """
+    Writes scraped items to an NDJSON file as soon as they are extracted, so a
+    crash mid-crawl keeps everything scraped so far and memory stays flat.
+
+    Deduplication runs online against a compact SimHash index of the content
+    written so far: an item is dropped if a near-duplicate with at least as much
+    content was already written. A longer near-duplicate is appended and
+    supersedes the earlier line when the file is finalized.
+    """
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.written = 0
+        self._index = NearDuplicateIndex()
+        self._lengths = []  # Longest content written per group of near-duplicates
+        self._lock = threading.Lock()
+        if append and os.path.exists(path):
+            for item in iter_ndjson_items(path):
+                self._remember(item)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _remember(self, item: dict) -> bool:
+        """Updates the dedup index; returns False when the item adds nothing new."""
+        if not item.get("title"):
+            return False
+        length = len(item.get("content", ""))
+        group = self._index.find_or_add(item_fingerprint(item), len(self._lengths))
+        if group is None:
+            self._lengths.append(length)
+            return True
+        if length <= self._lengths[group]:
+            return False
+        self._lengths[group] = length
+        return True
+
+    def write(self, items: list[dict]) -> int:
+        """Appends the new items and flushes; returns how many were written."""
+        count = 0
+        with self._lock:
+            for item in items:
+                if self._remember(item):
+                    self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+                    count += 1
+            self._file.flush()
+            self.written += count
+        return count
+
+    def close(self):
+        self._file.close()
+
+def finalize_ndjson(ndjson_path: str, output_path: str, team_id: str, status: str = "crawl_completed") -> int:
+    """
+    Produces the legacy JSON document ({"team_id", "items", "status"}) from an NDJSON
+    item file. Keeps the longest item per group of near-duplicates, in order of
+    first appearance, like the in-memory deduplication. Only line offsets and
+    fingerprints are held in memory.
+    Returns the number of items written.
+    """
+    # Pass 1: [offset, length] of the best line of each group, in order of first appearance
+    best = []
+    index = NearDuplicateIndex()
+    with open(ndjson_path, "rb") as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("title"):
+                continue
+            length = len(item.get("content", ""))
+            group = index.find_or_add(item_fingerprint(item), len(best))
+            if group is None:
+                best.append([offset, length])
+            elif length > best[group][1]:
+                best[group] = [offset, length]
+
+    # Pass 2: stream the winners into a document formatted like json.dump(..., indent=4)
+    with open(ndjson_path, "rb") as src, open(output_path, "w", encoding="utf-8") as out:
+        out.write("{\n" + f"    \"team_id\": {json.dumps(team_id)},\n    \"items\": [")
+        for i, (offset, _) in enumerate(best):
+            src.seek(offset)
+            item = json.loads(src.readline())
+            out.write(("," if i else "") + "\n" + textwrap.indent(json.dumps(item, indent=4), " " * 8))
+        out.write(("\n    ]" if best else "]") + f",\n    \"status\": {json.dumps(status)}\n" + "}")
+    return len(best)
@@ -0,0 +1,130 @@
+"""
+Near-duplicate detection with 64-bit SimHash over word shingles.
+
+Fingerprints of near-identical texts differ in only a few bits. The index splits
+each fingerprint into bands and only compares texts that share a band, so
+deduplicating n texts takes near-linear time instead of n^2 comparisons.
+"""
+
+import hashlib
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, List
+
+SHINGLE_SIZE = 5  # Words per shingle
+MAX_DISTANCE = 3  # Differing fingerprint bits still counted as a near-duplicate
+BANDS = 4  # 4 x 16-bit bands: fingerprints within 3 bits always share at least one band
+BAND_BITS = 64 // BANDS
+MIN_FINGERPRINT_WORDS = 50  # Shorter texts are too short to compare by SimHash
+
+_WORD = re.compile(r"\w+")
+
+# Byte -> low / high nibble tables, and the set bits of each nibble value
+_LOW_NIBBLE = bytes(value & 0x0F for value in range(256))
+_HIGH_NIBBLE = bytes(value >> 4 for value in range(256))
+_BITS_OF_NIBBLE = [[bit for bit in range(4) if value >> bit & 1] for value in range(16)]
+
+def _shingles(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of a text's word shingles (0 for a text without words)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    # Count how many shingle hashes set each bit, a nibble position at a time:
+    # the counting runs in C and only 16 distinct values per position are left to expand
+    bit_counts = [0] * 64
+    nibbles = (digests.translate(_LOW_NIBBLE), digests.translate(_HIGH_NIBBLE))
+    for position in range(8):
+        for half_index, column in enumerate(nibbles):
+            offset = position * 8 + half_index * 4
+            for value, count in Counter(column[position::8]).items():
+                for bit in _BITS_OF_NIBBLE[value]:
+                    bit_counts[offset + bit] += count
+    # A fingerprint bit is set when most shingle hashes have it set
+    half = len(shingles) / 2
+    return sum(1 << bit for bit, count in enumerate(bit_counts) if count > half)
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class NearDuplicateIndex:
+    """
+    Thread-safe index of SimHash fingerprints with banded lookup.
+    Each fingerprint is stored with a caller-chosen key (e.g. an item position or
+    a URL) that find() returns for any fingerprint within `max_distance` bits.
+    """
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._bands = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _band_values(fingerprint: int) -> List[int]:
+        mask = (1 << BAND_BITS) - 1
+        return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+    def find(self, fingerprint: int):
+        """Key of a stored near-duplicate of `fingerprint`, or None."""
+        with self._lock:
+            for band, value in zip(self._bands, self._band_values(fingerprint)):
+                for other, key in band.get(value, ()):
+                    if hamming_distance(fingerprint, other) <= self.max_distance:
+                        return key
+        return None
+
+    def add(self, fingerprint: int, key):
+        with self._lock:
+            for band, value in zip(self._bands, self._band_values(fingerprint)):
+                band.setdefault(value, []).append((fingerprint, key))
+
+    def find_or_add(self, fingerprint: int, key):
+        """Key of a stored near-duplicate; otherwise stores `key` and returns None."""
+        with self._lock:
+            values = self._band_values(fingerprint)
+            for band, value in zip(self._bands, values):
+                for other, existing in band.get(value, ()):
+                    if hamming_distance(fingerprint, other) <= self.max_distance:
+                        return existing
+            for band, value in zip(self._bands, values):
+                band.setdefault(value, []).append((fingerprint, key))
+        return None
+
+def item_fingerprint(item: Dict) -> int:
+    """
+    Fingerprint an item is compared on: the SimHash of its content. Content under
+    MIN_FINGERPRINT_WORDS words ("Read more", a teaser) cannot tell items apart,
+    so those are hashed on their exact title and content instead, and only match
+    an item with the same title and content.
+    """
+    content = item.get("content") or ""
+    words = _WORD.findall(content.lower())
+    if len(words) >= MIN_FINGERPRINT_WORDS:
+        return simhash(content)
+    title = " ".join(_WORD.findall((item.get("title") or "").lower()))
+    exact = f"{title}\n{' '.join(words)}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(exact, digest_size=8).digest(), "big")
+
+def deduplicate_near(items: List[Dict], fingerprint: Callable[[Dict], int] = item_fingerprint,
+                     max_distance: int = MAX_DISTANCE) -> List[Dict]:
+    """
+    Keeps one item per group of near-duplicates: the one with the longest content,
+    at the position where the group first appeared. Items without a title are dropped.
+    """
+    index = NearDuplicateIndex(max_distance)
+    kept: List[Dict] = []
+    for item in items:
+        if not item.get("title"):
+            continue
+        position = index.find_or_add(fingerprint(item), len(kept))
+        if position is None:
+            kept.append(item)
+        elif len(item.get("content", "")) > len(kept[position].get("content", "")):
+            kept[position] = item
+    return kept
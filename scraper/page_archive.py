@@ -0,0 +1,78 @@
+import gzip
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+class PageArchive:
+    """
+    Append-only archive of the raw pages a crawl fetched, so extraction can be
+    re-run later (new prompt, new local extractor) without crawling again.
+
+    Each page is one JSON record (url, status, headers, method, fetched_at, body)
+    compressed as its own gzip member and appended to the file. Concatenated gzip
+    members still form one valid .gz file (`zcat pages.jsonl.gz` shows the JSON
+    lines), a crash can only cut off the record being written, and later crawls
+    can keep appending to the same archive.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.written = 0
+        self._file = None  # Opened on the first page, reopened after close()
+        self._lock = threading.Lock()
+
+    def write(self, url: str, body: str, headers: Optional[Dict] = None, status: int = 200,
+              method: Optional[str] = None):
+        """Appends one fetched page and flushes it to disk."""
+        record = {
+            "url": url,
+            "status": status,
+            "headers": dict(headers or {}),
+            "method": method,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "body": body,
+        }
+        # Compressed outside the lock; only the append is serialized
+        member = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(member)
+            self._file.flush()
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def _iter_records(path: str) -> Iterator[Dict]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        # A crawl killed mid-write leaves a truncated last record; everything before it is intact
+        logger.warning(f"Archive {path} ends with an incomplete record, ignoring it: {e}")
+
+def iter_archive(path: str, latest_only: bool = True) -> Iterator[Dict]:
+    """
+    Yields the records of a PageArchive file one at a time, in the order they
+    were written. With `latest_only`, a URL archived by several crawls is only
+    yielded once, with its most recent page.
+    """
+    if not latest_only:
+        yield from _iter_records(path)
+        return
+    latest = {}  # url -> position of its last record; bodies are not kept in memory
+    for position, record in enumerate(_iter_records(path)):
+        latest[record["url"]] = position
+    for position, record in enumerate(_iter_records(path)):
+        if latest.get(record["url"]) == position:
+            yield record
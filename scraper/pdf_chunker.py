@@ -0,0 +1,84 @@
+"""
+Token-aware, heading-aligned chunking of PDF text for LLM extraction.
+"""
+
+import re
+from typing import Iterable, Iterator, List
+from content_windowing import CHARS_PER_TOKEN, estimate_tokens
+
+# "Chapter 3", "CHAPTER IV", "Part 2", "Appendix A", ...
+_CHAPTER_HEADING = re.compile(r"^(chapter|part|section|appendix|lesson)\s+([0-9]+|[ivxlc]+|[a-z])\b", re.IGNORECASE)
+# "3 Arrays and Strings", "4.2 Binary Search"
+_NUMBERED_HEADING = re.compile(r"^\d{1,2}(\.\d{1,2}){0,3}\.?\s+[A-Z][^.!?:;,]*$")
+MAX_HEADING_CHARS = 80
+
+def is_heading(line: str) -> bool:
+    """True for lines that look like a chapter or section title rather than prose."""
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS:
+        return False
+    if _CHAPTER_HEADING.match(line) or _NUMBERED_HEADING.match(line):
+        return True
+    # Short all-caps lines ("DYNAMIC PROGRAMMING") are headings in most books
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 4 and line.isupper() and len(line.split()) <= 8
+
+def _split_long_line(line: str, max_tokens: int) -> List[str]:
+    """Breaks a line longer than the budget at word boundaries (PDFs often lack line breaks)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces, current = [], ""
+    for word in line.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+def iter_chunks(pages: Iterable[str], target_tokens: int = 2500, overlap_tokens: int = 150) -> Iterator[str]:
+    """
+    Yields chunks of about `target_tokens` covering the whole text of `pages`
+    (page texts in reading order, consumed lazily). A chunk starts at a chapter or
+    section heading when one appears after at least a quarter of the target;
+    otherwise it is cut at a line boundary once the target is reached and the next
+    chunk repeats the last `overlap_tokens` of it for context. Only the current
+    chunk is held in memory.
+    """
+    min_tokens = target_tokens // 4
+    overlap_tokens = min(overlap_tokens, target_tokens // 2)
+    lines: List[str] = []
+    tokens = 0
+    carried = 0  # Leading lines of `lines` repeated from the previous chunk
+
+    def overlap_tail() -> List[str]:
+        tail, size = [], 0
+        for line in reversed(lines):
+            size += estimate_tokens(line) + 1
+            if size > overlap_tokens:
+                break
+            tail.insert(0, line)
+        return tail
+
+    for page in pages:
+        for raw_line in page.splitlines():
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            if tokens >= min_tokens and len(lines) > carried and is_heading(raw_line):
+                yield "\n".join(lines)
+                lines, tokens, carried = [], 0, 0
+            for line in _split_long_line(raw_line, target_tokens):
+                size = estimate_tokens(line) + 1
+                if tokens + size > target_tokens and len(lines) > carried:
+                    yield "\n".join(lines)
+                    lines = overlap_tail()
+                    tokens = sum(estimate_tokens(kept) + 1 for kept in lines)
+                    carried = len(lines)
+                if tokens + size > target_tokens:  # Overlap and line do not fit together: drop the overlap
+                    lines, tokens, carried = [], 0, 0
+                lines.append(line)
+                tokens += size
+    if len(lines) > carried:
+        yield "\n".join(lines)
@@ -1,93 +1,177 @@
 import PyPDF2
 import json
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict
 import openai
 from api_key_manager import get_openai_api_key
+from llm_cache import LLMCache, get_llm_cache
+from batch_extractor import BatchExtractor
+from pdf_chunker import iter_chunks
+from llm_dispatch import LLMDispatcher, get_llm_dispatcher
+from metrics import Metrics, get_metrics
+
+PAGES_PER_TASK = 25  # Pages each extraction process handles at a time
+MIN_PARALLEL_PAGES = 50  # Smaller PDFs are extracted in-process; a pool would cost more than it saves
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, stop: int = None) -> Iterator[str]:
+    """
+    Lazily yields the text of pages [start, stop) of a PDF. The file is memory-mapped
+    rather than read, and the reader's cache of parsed objects is dropped every few
+    pages, so memory does not grow with the size of the document.
+    """
+    with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        pdf_reader = PyPDF2.PdfReader(mapped)
+        stop = len(pdf_reader.pages) if stop is None else stop
+        for i in range(start, stop):
+            yield pdf_reader.pages[i].extract_text() or ""
+            if (i - start) % PAGES_PER_TASK == PAGES_PER_TASK - 1:
+                pdf_reader.resolved_objects.clear()  # Content streams of pages already read
+
+def _pdf_page_count(pdf_path: str) -> int:
+    with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return len(PyPDF2.PdfReader(mapped).pages)
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of a PDF (runs in a worker process, so it opens its own reader)"""
+    return list(iter_pdf_pages(pdf_path, start, stop))
 
 class PDFProcessor:
     """
-    Processes PDF files and extracts content using AI
+    Processes PDF files and extracts content using AI.
+    Page text is extracted across `workers` processes (defaults to the CPU count)
+    and up to `max_concurrency` chunks are sent to the LLM at once. Pages are read
+    lazily and chunked as they stream in, so memory is bounded by the chunk size
+    and the read-ahead windows, not by the size of the PDF.
     """
     
-    def __init__(self):
+    def __init__(self, cache: LLMCache = None, workers: int = None, max_concurrency: int = 4,
+                 chunk_tokens: int = 2500, overlap_tokens: int = 150, llm: LLMDispatcher = None,
+                 metrics: Metrics = None):
         api_key = get_openai_api_key()
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = openai.OpenAI(api_key=api_key)  # Batch API jobs
+        self.llm = llm or get_llm_dispatcher()  # Rate-limit-aware chat completions
+        self.cache = cache or get_llm_cache()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_concurrency = max(1, max_concurrency)
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.metrics = metrics or get_metrics()  # Page read and chunk extraction timings, tokens
     
-    def process_pdf(self, pdf_path: str, title: str, max_chunks: int = 5) -> List[Dict]:
-        """Process PDF and return structured content chunks"""
+    def process_pdf(self, pdf_path: str, title: str, batch: bool = False) -> List[Dict]:
+        """
+        Process PDF and return structured content chunks covering the whole document.
+        With batch=True all chunks are extracted in one OpenAI Batch API job.
+        """
         
         print(f"📖 Processing PDF: {title}")
         
-        # Extract text from PDF
-        text_content = self._extract_pdf_text(pdf_path)
-        
-        if not text_content:
-            print(f"❌ No text extracted from {pdf_path}")
-            return []
-        
-        # Split into chunks (roughly by pages or sections)
-        chunks = self._split_into_chunks(text_content, max_chunks)
+        # Split the lazily extracted page text into chunks at chapter/section headings within the token budget
+        chunks = self._split_into_chunks(self._timed_pages(self._iter_pdf_pages(pdf_path), pdf_path))
         
-        print(f"📄 Split into {len(chunks)} chunks")
+        if batch:
+            chunks = list(chunks)
+            if not chunks:
+                print(f"❌ No text extracted from {pdf_path}")
+                return []
+            print(f"📄 Split into {len(chunks)} chunks")
+            return self._extract_chunks_batch(chunks, title)
         
-        # Process each chunk with AI
-        items = []
-        for i, chunk in enumerate(chunks):
-            print(f"🤖 Processing chunk {i+1}/{len(chunks)}...")
-            
+        # Process chunks with AI concurrently, collecting results in chunk order.
+        # Only a few chunks are read ahead, so the generator is consumed as extraction keeps up.
+        def extract(i, chunk):
+            print(f"🤖 Processing chunk {i+1}...")
             try:
-                item = self._ai_extract_pdf_chunk(chunk, title, i+1)
-                if item:
-                    items.append(item)
+                with self.metrics.timer("pdf_extract", pdf_path):
+                    return self._ai_extract_pdf_chunk(chunk, title, i+1, source=pdf_path)
             except Exception as e:
                 print(f"❌ Error processing chunk {i+1}: {e}")
-                continue
+                return None
         
-        return items
+        items = []
+        chunk_count = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for i, chunk in enumerate(chunks):
+                chunk_count += 1
+                in_flight.append(executor.submit(extract, i, chunk))
+                if len(in_flight) >= 2 * self.max_concurrency:
+                    items.append(in_flight.popleft().result())
+            while in_flight:
+                items.append(in_flight.popleft().result())
+        
+        if not chunk_count:
+            print(f"❌ No text extracted from {pdf_path}")
+            return []
+        print(f"📄 Extracted {chunk_count} chunks")
+        return [item for item in items if item]
     
-    def _extract_pdf_text(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
+    def _iter_pdf_pages(self, pdf_path: str) -> Iterator[str]:
+        """
+        Yield the text of each page in order. Large PDFs are extracted by worker
+        processes in page ranges, with at most two ranges per worker in flight.
+        """
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                # Extract text from all pages
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                return text.strip()
+            page_count = _pdf_page_count(pdf_path) if self.workers > 1 else 0
+            
+            if page_count < MIN_PARALLEL_PAGES:
+                yield from iter_pdf_pages(pdf_path)
+                return
+            
+            starts = range(0, page_count, PAGES_PER_TASK)
+            window = deque()
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(starts))) as executor:
+                for start in starts:
+                    window.append(executor.submit(_extract_page_range, pdf_path, start, min(start + PAGES_PER_TASK, page_count)))
+                    if len(window) >= 2 * self.workers:
+                        yield from window.popleft().result()
+                while window:
+                    yield from window.popleft().result()
                 
         except Exception as e:
             print(f"❌ Error reading PDF {pdf_path}: {e}")
-            return ""
     
-    def _split_into_chunks(self, text: str, max_chunks: int) -> List[str]:
-        """Split text into manageable chunks"""
+    def _timed_pages(self, pages: Iterable[str], pdf_path: str) -> Iterator[str]:
+        """Pass pages through, recording how long each one took to arrive"""
+        started = time.perf_counter()
+        for text in pages:
+            self.metrics.observe("pdf_read", time.perf_counter() - started, pdf_path)
+            self.metrics.increment("pdf_pages")
+            yield text
+            started = time.perf_counter()
+    
+    def _split_into_chunks(self, pages: Iterable[str]) -> Iterator[str]:
+        """Split page texts into heading-aligned chunks of about `chunk_tokens` tokens"""
+        return iter_chunks(pages, target_tokens=self.chunk_tokens, overlap_tokens=self.overlap_tokens)
+    
+    def _extract_chunks_batch(self, chunks: List[str], title: str) -> List[Dict]:
+        """Extract every chunk in a single batch job, keeping chunk order"""
+        extractor = BatchExtractor(self.client, cache=self.cache, metrics=self.metrics)
+        for i, chunk in enumerate(chunks):
+            extractor.add(f"chunk-{i+1}", self._build_chunk_request(chunk, title, i+1))
         
-        # Try to split by chapters first
-        if "Chapter" in text or "CHAPTER" in text:
-            # Split by chapters
-            import re
-            chapters = re.split(r'Chapter \d+|CHAPTER \d+', text, flags=re.IGNORECASE)
-            chunks = [chunk.strip() for chunk in chapters if chunk.strip()]
-        else:
-            # Split by approximate word count (2000 words per chunk)
-            words = text.split()
-            chunk_size = len(words) // max_chunks if len(words) > max_chunks * 1000 else 2000
-            
-            chunks = []
-            for i in range(0, len(words), chunk_size):
-                chunk = " ".join(words[i:i + chunk_size])
-                if chunk.strip():
-                    chunks.append(chunk.strip())
+        print(f"📦 Submitted {len(chunks)} chunks as a batch, waiting for results...")
+        answers = extractor.run()
         
-        # Limit to max_chunks
-        return chunks[:max_chunks]
+        items = []
+        for i, chunk in enumerate(chunks):
+            content = answers.get(f"chunk-{i+1}")
+            try:
+                if content is None:
+                    raise ValueError("no answer in batch output")
+                items.append(self._format_chunk_item(json.loads(content), chunk, title, i+1))
+                extractor.remember(f"chunk-{i+1}")
+            except Exception as e:
+                print(f"❌ AI extraction error for chunk {i+1}: {e}")
+                items.append(self._fallback_chunk_item(chunk, title, i+1))
+        return items
     
-    def _ai_extract_pdf_chunk(self, chunk_text: str, book_title: str, chunk_num: int) -> Dict:
-        """Use AI to extract structured data from PDF chunk"""
+    def _build_chunk_request(self, chunk_text: str, book_title: str, chunk_num: int) -> Dict:
+        """Chat completion request that extracts structured data from a PDF chunk"""
         
         system_prompt = """You are a technical content analyzer. Extract structured data from book chapters and technical content.
 
@@ -115,41 +199,60 @@ Section {chunk_num}
 </SECTION_NUMBER>
 
 <CONTENT>
-{chunk_text[:6000]}
+{chunk_text}
 </CONTENT>"""
 
+        return {
+            "model": "gpt-4o-mini",
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0,
+            "max_tokens": 2000
+        }
+    
+    def _format_chunk_item(self, extracted: Dict, chunk_text: str, book_title: str, chunk_num: int) -> Dict:
+        """Format the AI's answer to match required output structure"""
+        return {
+            "title": extracted.get("title", f"{book_title} - Section {chunk_num}"),
+            "content": extracted.get("content", chunk_text[:1000]),
+            "content_type": "book",
+            "source_url": "",  # No URL for PDFs
+            "author": extracted.get("author", "Aline"),
+            "user_id": ""
+        }
+    
+    def _fallback_chunk_item(self, chunk_text: str, book_title: str, chunk_num: int) -> Dict:
+        """Basic structure used when AI extraction fails"""
+        return {
+            "title": f"{book_title} - Section {chunk_num}",
+            "content": chunk_text[:1000],
+            "content_type": "book",
+            "source_url": "",
+            "author": "Aline",
+            "user_id": ""
+        }
+    
+    def _ai_extract_pdf_chunk(self, chunk_text: str, book_title: str, chunk_num: int, source: str = None) -> Dict:
+        """Use AI to extract structured data from PDF chunk (`source` labels its token usage)"""
+        request = self._build_chunk_request(chunk_text, book_title, chunk_num)
+        cache_key = self.cache.make_key(**request)
+
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0,
-                max_tokens=2000
-            )
+            content = self.cache.get(cache_key)
+            cached = content is not None
+            if not cached:
+                content = self.llm.complete(request, stage="pdf_extract", url=source)
             
-            extracted = json.loads(response.choices[0].message.content)
+            extracted = json.loads(content)
+            if not cached:
+                self.cache.set(cache_key, content)
             
-            # Format to match required output structure
-            return {
-                "title": extracted.get("title", f"{book_title} - Section {chunk_num}"),
-                "content": extracted.get("content", chunk_text[:1000]),
-                "content_type": "book",
-                "source_url": "",  # No URL for PDFs
-                "author": extracted.get("author", "Aline"),
-                "user_id": ""
-            }
+            return self._format_chunk_item(extracted, chunk_text, book_title, chunk_num)
             
         except Exception as e:
             print(f"❌ AI extraction error for chunk {chunk_num}: {e}")
             # Fallback: return basic structure
-            return {
-                "title": f"{book_title} - Section {chunk_num}",
-                "content": chunk_text[:1000],
-                "content_type": "book",
-                "source_url": "",
-                "author": "Aline",
-                "user_id": ""
-            } 
\ No newline at end of file
+            return self._fallback_chunk_item(chunk_text, book_title, chunk_num) 
\ No newline at end of file
@@ -0,0 +1,68 @@
+import logging
+import queue
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Tells one worker thread to exit
+
+class Stage:
+    """
+    One stage of a processing pipeline: `workers` threads running `handler` on the
+    jobs put into the stage. At most `queue_size` jobs wait in front of the stage;
+    put() blocks while it is full, so a slow stage holds back the stages that feed
+    it instead of letting work pile up in memory (backpressure).
+
+    put(job, wait=False) bypasses the limit. It is meant for jobs sent back to an
+    earlier stage or to the same one (e.g. a retry), which must never block: that
+    stage may be waiting on this one, or be this very worker.
+    """
+    def __init__(self, name: str, handler: Callable, workers: int = 1, queue_size: int | None = None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._jobs = queue.Queue()
+        self._room = threading.Semaphore(queue_size or 2 * self.workers)
+        self._cancelled = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(self.workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, job, wait: bool = True) -> bool:
+        """Queues a job; False if the stage was cancelled before there was room for it."""
+        if wait:
+            while not self._room.acquire(timeout=0.5):
+                if self._cancelled.is_set():
+                    return False
+        self._jobs.put((job, wait))
+        return True
+
+    def cancel(self):
+        """Drops the jobs still queued; jobs already being handled run to completion."""
+        self._cancelled.set()
+
+    def close(self):
+        """Waits for queued jobs (unless cancelled) and in-flight jobs, then stops the workers."""
+        for _ in self._threads:
+            self._jobs.put((_STOP, False))
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            job, holds_room = self._jobs.get()
+            if holds_room:
+                self._room.release()
+            if job is _STOP:
+                return
+            if self._cancelled.is_set():
+                continue
+            try:
+                self.handler(job)
+            except Exception as e:
+                logger.exception(f"Unhandled error in {self.name} stage: {e}")
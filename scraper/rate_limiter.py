@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+import logging
+from typing import Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+RECOVERY_REQUESTS = 20  # Successful requests in a row that undo one halving of a host's rate after a 429
+MIN_RATE = 0.05  # Requests per second a host is never slowed below
+
+class _Bucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.max_rate = rate  # The configured rate, lowered by Crawl-delay; 429s slow down below it for a while
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.penalty = 0.0
+        self.successes = 0
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class HostRateLimiter:
+    """
+    Politeness scheduler: one token bucket per host.
+
+    Each host gets `requests_per_second` (lowered by a robots.txt Crawl-delay) and
+    is paused and slowed down after a 429, then sped up again step by step as its
+    requests succeed. Callers only wait for their own host, so requests to
+    different hosts proceed in parallel.
+    """
+
+    def __init__(self, requests_per_second: float = 2.0, burst: int = 1):
+        if requests_per_second <= 0:
+            raise ValueError(f"requests_per_second must be greater than 0, got {requests_per_second}")
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.requests_per_second, self.burst)
+        return bucket
+
+    def set_crawl_delay(self, host: str, delay: float):
+        """Apply a robots.txt Crawl-delay (seconds between requests) to `host`; 0 or less means no delay"""
+        if not 0 < delay < math.inf:
+            return
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.max_rate = min(bucket.max_rate, 1.0 / delay)
+            bucket.rate = min(bucket.rate, bucket.max_rate)
+        logger.info(f"🐢 Crawl-delay for {host}: {delay}s")
+
+    def acquire(self, url: str):
+        """Block until a request to the URL's host is allowed"""
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            bucket.refill(now)
+            # Reserve a token now (the balance may go negative) and sleep outside the lock
+            bucket.tokens -= 1
+            wait = max(-bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0, bucket.blocked_until - now)
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, url: str, retry_after: Optional[float] = None):
+        """
+        Back off a host that answered 429: pause it for Retry-After (or an
+        exponentially growing penalty) and halve its request rate until
+        record_success() restores it.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.penalty = min(60.0, max(1.0, bucket.penalty * 2))
+            pause = retry_after if retry_after is not None else bucket.penalty
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+            bucket.rate = max(bucket.rate / 2, MIN_RATE)
+            bucket.successes = 0
+        logger.warning(f"⏳ 429 from {host}, pausing {pause:.1f}s")
+
+    def record_success(self, url: str):
+        """
+        Count a request the host answered without a 429. Every RECOVERY_REQUESTS
+        in a row double a slowed-down host's rate, up to its configured rate.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            if bucket.rate >= bucket.max_rate:
+                return
+            bucket.successes += 1
+            if bucket.successes < RECOVERY_REQUESTS:
+                return
+            bucket.successes = 0
+            bucket.rate = min(bucket.rate * 2, bucket.max_rate)
+            if bucket.rate >= bucket.max_rate:
+                bucket.penalty = 0.0  # Fully recovered: the next 429 starts the backoff over
+            rate = bucket.rate
+        logger.info(f"🐇 {host} recovered to {rate:.2f} requests/s")
@@ -0,0 +1,51 @@
+"""
+Result of one scraping attempt on a URL.
+
+Results stay plain dicts, since they are merged and written out as JSON as they
+are; ScrapeResult documents their keys. A failed attempt records which side
+failed, which decides what is worth repeating:
+
+- "fetch": the page could not be downloaded, or came back without the content
+  (bot wall, JavaScript shell). Another strategy has to fetch it again.
+- "extraction": the page was fetched fine but the LLM answer was unusable. The
+  fetched HTML is still in memory, so only the extraction is repeated.
+"""
+
+from typing import Dict, List, Optional, TypedDict
+
+# Statuses that count as success even without items
+SUCCESS_STATUSES = ("not_modified", "near_duplicate")
+
+class ScrapeResult(TypedDict, total=False):
+    team_id: str
+    items: List[Dict]
+    # not_modified, near_duplicate, fetch_failed, extraction_failed, llm_unavailable, all_strategies_failed
+    status: str
+    failure: str  # "fetch" or "extraction" when the attempt failed
+    retryable: bool  # For extraction failures: whether repeating the extraction may help
+    error: str
+    fetch_meta: Dict  # New validators (ETag, Last-Modified, content hash)
+    links: List[str]
+    duplicate_of: str
+
+def fetch_failure(team_id: str, error: str) -> ScrapeResult:
+    return {"team_id": team_id, "items": [], "status": "fetch_failed", "failure": "fetch", "error": error}
+
+def extraction_failure(team_id: str, error: str, retryable: bool = True,
+                       status: str = "extraction_failed") -> ScrapeResult:
+    return {"team_id": team_id, "items": [], "status": status, "failure": "extraction",
+            "retryable": retryable, "error": error}
+
+def failure_of(result: Optional[ScrapeResult]) -> Optional[str]:
+    """"fetch", "extraction", or None when the attempt succeeded."""
+    if not result:
+        return "fetch"
+    if result.get("failure"):
+        return result["failure"]
+    if result.get("items") or result.get("status") in SUCCESS_STATUSES:
+        return None
+    # Extracted fine but nothing found: the fetched page most likely lacked the content
+    return "fetch"
+
+def is_retryable_extraction(result: Optional[ScrapeResult]) -> bool:
+    return failure_of(result) == "extraction" and bool(result.get("retryable"))
@@ -0,0 +1,143 @@
+import logging
+import queue
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 64 * 1024
+_DONE = object()  # Sent by each sitemap task when it finishes
+
+def _local_name(tag: str) -> str:
+    """Tag name without its XML namespace ("{http://...}loc" -> "loc")."""
+    return tag.rsplit("}", 1)[-1]
+
+def parse_sitemap_stream(chunks: Iterable[bytes]) -> Iterator[tuple[str, str, str | None]]:
+    """
+    Incrementally parses a sitemap or sitemap index from a stream of byte chunks,
+    gzipped or not. Yields ("url", loc, lastmod) for pages and ("sitemap", loc,
+    lastmod) for the child sitemaps of an index. Elements are cleared as soon as
+    they are read, so memory stays flat on 50k-entry files.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    decompressor = None
+    head = b""  # First bytes, held until the gzip magic number can be checked
+    root = None
+
+    def entries():
+        nonlocal root
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            kind = _local_name(elem.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+            loc = lastmod = None
+            for child in elem:
+                name = _local_name(child.tag)
+                if name == "loc" and child.text:
+                    loc = child.text.strip()
+                elif name == "lastmod" and child.text:
+                    lastmod = child.text.strip()
+            root.clear()  # Drop the entries parsed so far
+            if loc:
+                yield kind, loc, lastmod
+
+    for chunk in chunks:
+        if head is not None:
+            head += chunk
+            if len(head) < len(GZIP_MAGIC):
+                continue
+            chunk, head = head, None
+            if chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+        yield from entries()
+    if head:
+        parser.feed(head)
+    parser.close()
+    yield from entries()
+
+def iter_sitemap(http, sitemap_url: str, max_workers: int = 4, timeout: float = 10,
+                 queue_size: int = 10000) -> Iterator[tuple[str, str | None]]:
+    """
+    Yields (page URL, lastmod) from a sitemap as it is parsed, following sitemap
+    indexes. Child sitemaps are fetched and parsed concurrently on `max_workers`
+    threads; entries arrive in no particular order. Responses are streamed, never
+    held in memory whole, and `.xml.gz` files are decompressed on the fly.
+
+    `http` is the scraper's HTTPClient, so fetches are pooled and rate limited.
+    A sitemap that fails to download or parse is logged and skipped; whatever it
+    yielded before the error is kept. Stopping the iteration early cancels the
+    remaining work.
+    """
+    entries = queue.Queue(maxsize=queue_size)  # Bounded: parsing waits for the consumer
+    stop = threading.Event()
+    seen = set()
+    lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="sitemap")
+    pending = 0
+
+    def put(item) -> bool:
+        """Waits for room in the queue; False once the consumer has stopped"""
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def submit(url: str):
+        nonlocal pending
+        with lock:
+            if url in seen or stop.is_set():  # Indexes that list each other would loop forever
+                return
+            seen.add(url)
+            pending += 1
+        executor.submit(fetch, url)
+
+    def fetch(url: str):
+        count = 0
+        try:
+            response = http.get(url, timeout=timeout, stream=True)
+            try:
+                response.raise_for_status()
+                # iter_content undoes any Content-Encoding; .gz files are handled by the parser
+                for kind, loc, lastmod in parse_sitemap_stream(response.iter_content(CHUNK_SIZE)):
+                    if kind == "sitemap":
+                        submit(loc)
+                    elif put((loc, lastmod)):
+                        count += 1
+                    else:
+                        return
+            finally:
+                response.close()
+            logger.info(f"Parsed sitemap {url}: {count} URLs")
+        except Exception as e:  # Network errors, HTTP errors and malformed XML alike
+            logger.warning(f"Could not fetch or parse sitemap {url}: {e}")
+        finally:
+            put(_DONE)
+
+    def remaining() -> int:
+        with lock:
+            return pending
+
+    submit(sitemap_url)
+    try:
+        while remaining():
+            item = entries.get()
+            if item is _DONE:
+                with lock:
+                    pending -= 1
+                continue
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
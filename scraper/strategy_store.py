@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 5.0  # Seconds between writes while attempts keep being recorded
+
+class StrategyStore:
+    """
+    On-disk memory of which scraping method works for each domain.
+    Keeps success/failure counts and total latency per method so the scraper
+    can skip the strategy LLM call once a domain has a confident winner.
+
+    Attempts are recorded in memory and written out at most every
+    `save_interval` seconds; flush() writes what is left at the end of a run.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_successes: int = 3, min_success_rate: float = 0.8,
+                 save_interval: float = SAVE_INTERVAL):
+        self.path = Path(path) if path else Path.home() / '.scraper_strategies.json'
+        self.min_successes = min_successes
+        self.min_success_rate = min_success_rate
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False  # Recorded attempts not written yet
+        self._last_save = 0.0
+        self.domains = self._load()
+
+    def _load(self) -> Dict:
+        """Load the stored stats, starting empty if the file is missing or unreadable"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read strategy store {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        """Write the stats atomically so a crash never leaves a half-written file"""
+        self._dirty = False
+        self._last_save = time.monotonic()
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.domains, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save strategy store {self.path}: {e}")
+
+    def record(self, domain: str, method: str, success: bool, latency: float):
+        """Record the outcome of one strategy attempt"""
+        with self._lock:
+            stats = self.domains.setdefault(domain, {}).setdefault(
+                method, {"success": 0, "failure": 0, "total_latency": 0.0, "last_success": False}
+            )
+            stats["success" if success else "failure"] += 1
+            stats["total_latency"] += latency
+            stats["last_success"] = success
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+    def flush(self):
+        """Write attempts recorded since the last save"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def best_method(self, domain: str) -> Optional[str]:
+        """
+        Return the method to use without asking the LLM, or None when no method
+        is a confident winner (too few successes, low success rate or a fresh failure).
+        """
+        with self._lock:
+            candidates = []
+            for method, stats in self.domains.get(domain, {}).items():
+                attempts = stats["success"] + stats["failure"]
+                if not stats["last_success"] or stats["success"] < self.min_successes:
+                    continue
+                success_rate = stats["success"] / attempts
+                if success_rate >= self.min_success_rate:
+                    candidates.append((-success_rate, stats["total_latency"] / attempts, method))
+            return min(candidates)[2] if candidates else None
+
+    def summary(self, domain: str) -> Dict:
+        """Known successful and failed methods for a domain, as shown to the strategy agent"""
+        with self._lock:
+            methods = self.domains.get(domain, {})
+            return {
+                "successful": [m for m, s in methods.items() if s["success"]],
+                "failed": [m for m, s in methods.items() if not s["last_success"]],
+            }